@@ -1,12 +1,15 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-import logging
-from passlib.context import CryptContext
+import hashlib, logging, time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from database import get_db, run_db
+from cache import TTLCache, bump_version, current_version
+from hashing import pwd_context
 import models, os
 from dotenv import load_dotenv
 
@@ -15,11 +18,72 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "civictrack-super-secret-key-change-in-production")
 ALGORITHM  = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+PRINCIPAL_CACHE_SIZE        = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))   # backstop for writes outside SQLAlchemy
+PRINCIPAL_VERSION_CHECK_SECONDS = float(os.getenv("PRINCIPAL_VERSION_CHECK_SECONDS", "5"))
+TOKEN_CACHE_SIZE            = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
 basedir = os.path.dirname(__file__)
-pwd_context   = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
 logger = logging.getLogger(__name__)
 bearer_scheme = HTTPBearer()
+optional_bearer_scheme = HTTPBearer(auto_error=False)
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated caller: only the user fields the routers read."""
+    id: int
+    role: models.RoleEnum
+    is_active: bool
+    ward: Optional[str]
+
+# user id -> Principal, so authenticated requests skip the users lookup. Any users write bumps
+# the "users" cache_versions row; each worker checks it every PRINCIPAL_VERSION_CHECK_SECONDS and
+# drops all its principals when it moved, so another worker's change is seen within that.
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+USERS_VERSION = "users"
+_users_seen = {"version": None, "next_check": 0.0}
+# sha256(token) -> verified claims, kept until the token's exp. Only tokens that passed the
+# signature check get in, so garbage tokens cannot grow it, and maxsize bounds the rest.
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    # role/active/ward may have changed: drop the principal now and again once the change is
+    # committed, so a request racing the transaction cannot re-cache the old values
+    principal_cache.pop(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_principals", set()).add(target.id)
+
+@event.listens_for(Session, "after_flush_postexec")
+def _bump_users_version(session, flush_context):
+    if session.info.get("stale_principals") and not session.info.get("users_version_bumped"):
+        bump_version(session, USERS_VERSION); session.info["users_version_bumped"] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_user_write(state):
+    # query(User).update() and update(User) skip after_update; which users changed is unknown
+    if (state.is_update or state.is_delete) and getattr(getattr(state.statement, "table", None), "name", None) == models.User.__tablename__:
+        if not state.session.info.get("users_version_bumped"):
+            bump_version(state.session, USERS_VERSION); state.session.info["users_version_bumped"] = True
+        state.session.info["stale_principals_all"] = True
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_principals(session):
+    session.info.pop("users_version_bumped", None)
+    if session.info.pop("stale_principals_all", False): principal_cache.clear()
+    for user_id in session.info.pop("stale_principals", ()):
+        principal_cache.pop(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_principals(session):
+    for key in ("users_version_bumped", "stale_principals_all", "stale_principals"): session.info.pop(key, None)
+
+def _check_users_version(db: Session):
+    """Drop every cached principal if another worker changed users since the last check."""
+    version = current_version(db, USERS_VERSION)
+    if _users_seen["version"] is not None and version != _users_seen["version"]: principal_cache.clear()
+    _users_seen["version"], _users_seen["next_check"] = version, time.monotonic() + PRINCIPAL_VERSION_CHECK_SECONDS
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -37,16 +101,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str) -> Optional[dict]:
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         logger.exception("Failed to decode JWT token")
         return None
+    ttl = payload["exp"] - time.time() if "exp" in payload else None
+    if ttl is None or ttl > 0:
+        token_cache.set(digest, payload, ttl)
+    return payload
 
-def get_current_user(
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    user = db.query(models.User.id, models.User.role, models.User.is_active, models.User.ward).filter(models.User.id == user_id).first()
+    return Principal(id=user.id, role=user.role, is_active=user.is_active is not False, ward=user.ward) if user else None
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
     db: Session = Depends(get_db)
-) -> models.User:
+) -> Principal:
     token = credentials.credentials
 
     payload = decode_token(token)
@@ -65,23 +141,47 @@ def get_current_user(
         )
 
     try:
-        user = db.query(models.User).filter(models.User.id == int(user_id)).first()
+        user_id = int(user_id)
     except ValueError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid user ID format"
         )
 
-    if not user:
+    if time.monotonic() >= _users_seen["next_check"]:
+        await run_db(db, _check_users_version)
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = await run_db(db, _load_principal, user_id)
+        if not principal:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        principal_cache.set(user_id, principal)
+
+    if not principal.is_active:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
         )
 
-    return user
+    return principal
+
+async def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer_scheme),
+    db: Session = Depends(get_db)
+) -> Optional[Principal]:
+    # public endpoints: a missing or stale token just means an anonymous caller
+    if not credentials:
+        return None
+    try:
+        return await get_current_user(credentials, db)
+    except HTTPException:
+        return None
 
 def require_role(*roles):
-    def _checker(current_user: models.User = Depends(get_current_user)):
+    async def _checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
         return current_user
@@ -0,0 +1,63 @@
+"""Login throughput benchmark against a running server.
+
+    python bench_login.py --users 20 --requests 400 --concurrency 32
+
+Signs up --users accounts (or reuses them), then fires --requests logins from
+--concurrency threads while polling /health, and reports logins/s, latency
+percentiles, 503 sheds, and /health latency, which should stay flat while bcrypt
+runs in the hashing pool.
+"""
+import argparse, statistics, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+def percentile(values, p):
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://127.0.0.1:8000")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=32)
+    args = ap.parse_args()
+
+    creds = [{"email": f"bench{i}@civictrack.dev", "password": f"bench-pass-{i}"} for i in range(args.users)]
+    for i, c in enumerate(creds):
+        r = requests.post(f"{args.base}/api/auth/signup", json={"name": f"Bench {i}", "ward": "Bench", **c})
+        if r.status_code not in (201, 400): raise SystemExit(f"signup failed: {r.status_code} {r.text}")
+
+    latencies, codes, lock = [], {}, threading.Lock()
+    def login(i):
+        t0 = time.perf_counter()
+        r = requests.post(f"{args.base}/api/auth/login", json=creds[i % len(creds)])
+        elapsed = (time.perf_counter() - t0) * 1000
+        with lock:
+            codes[r.status_code] = codes.get(r.status_code, 0) + 1
+            if r.status_code == 200: latencies.append(elapsed)
+
+    health, done = [], threading.Event()
+    def probe():
+        while not done.is_set():
+            t0 = time.perf_counter(); requests.get(f"{args.base}/health")
+            health.append((time.perf_counter() - t0) * 1000)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe); prober.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        list(ex.map(login, range(args.requests)))
+    wall = time.perf_counter() - t0
+    done.set(); prober.join()
+
+    print(f"logins: {args.requests} in {wall:.2f}s -> {codes.get(200, 0) / wall:.1f} successful/s")
+    print(f"status codes: {dict(sorted(codes.items()))}")
+    if latencies:
+        print(f"login latency ms: p50 {percentile(latencies, 50):.0f}  p95 {percentile(latencies, 95):.0f}  p99 {percentile(latencies, 99):.0f}  mean {statistics.mean(latencies):.0f}")
+    if health:
+        print(f"/health latency ms during run: p50 {percentile(health, 50):.1f}  p95 {percentile(health, 95):.1f}  max {max(health):.1f}")
+
+if __name__ == '__main__':
+    main()
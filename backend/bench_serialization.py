@@ -0,0 +1,80 @@
+"""Report list serialisation: FastAPI's response_model path vs the precompiled adapter.
+
+    python bench_serialization.py --rows 500 --repeat 50
+
+Builds a department-queue sized page of in-memory Report objects (department and three
+status changes each, like report_query loads) and times turning it into response bytes.
+No server or database needed.
+"""
+import argparse, asyncio, json, statistics, time
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+import models, schemas, services
+
+def make_reports(n):
+    now = datetime.now(timezone.utc)
+    dept = models.Department(id=1, name="Roads & Infrastructure", contact_email="roads@civictrack.gov", ward="Ward 12", supported_issue_types="pothole,road_damage")
+    reports = []
+    for i in range(n):
+        created = now - timedelta(hours=i)
+        history = [
+            models.StatusHistory(id=3 * i + k, report_id=i, old_status=old, new_status=new, remark=remark, changed_by=7, timestamp=created + timedelta(hours=k))
+            for k, (old, new, remark) in enumerate([
+                (None, models.StatusEnum.assigned, "Auto-assigned"),
+                (models.StatusEnum.assigned, models.StatusEnum.acknowledged, "Crew notified"),
+                (models.StatusEnum.acknowledged, models.StatusEnum.in_progress, "Repair scheduled for this week"),
+            ])
+        ]
+        reports.append(models.Report(
+            id=i, title=f"Deep pothole near bus stop {i}", description="Large pothole in the left lane, water-logged after rain and causing two-wheelers to swerve. " * 2,
+            issue_type=models.IssueTypeEnum.pothole, latitude=12.9716 + i * 1e-4, longitude=77.5946 - i * 1e-4,
+            address=f"{i} MG Road, Bengaluru", image_url=f"https://img.civictrack.gov/reports/{i}.jpg",
+            status=models.StatusEnum.in_progress, priority=models.PriorityEnum.high, priority_score=42.5 + i,
+            upvote_count=i % 50, is_hotspot=i % 7 == 0, is_duplicate=False, canonical_id=None,
+            sla_deadline=created + timedelta(hours=72), created_at=created, updated_at=created + timedelta(hours=2),
+            user_id=7, department_id=1, department=dept, status_history=history,
+        ))
+    return reports
+
+async def old_path(field, reports):
+    # what a route returning ORM objects with response_model=List[ReportOut] did
+    content = await serialize_response(field=field, response_content=reports, is_coroutine=True)
+    return JSONResponse(content).body
+
+async def orjson_path(field, reports):
+    # same, with only the default response class switched to ORJSONResponse
+    content = await serialize_response(field=field, response_content=reports, is_coroutine=True)
+    return ORJSONResponse(content).body
+
+async def fast_path(field, reports):
+    return services.render_reports(None, reports, None).body
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+    reports = make_reports(args.rows)
+    field = create_response_field(name="Response_list_reports", type_=List[schemas.ReportOut])
+
+    async def run():
+        timings, bodies = {}, {}
+        for name, path in (("response_model + JSONResponse", old_path), ("response_model + ORJSONResponse", orjson_path), ("render_reports (TypeAdapter bytes)", fast_path)):
+            bodies[name] = await path(field, reports)   # warm-up
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter(); await path(field, reports)
+                samples.append((time.perf_counter() - t0) * 1000)
+            timings[name] = statistics.median(samples)
+            print(f"{name:<36} {timings[name]:8.2f} ms median  ({len(bodies[name]) / 1024:.0f} KiB)")
+        same = len({json.dumps(json.loads(body)) for body in bodies.values()}) == 1
+        base, fast = timings["response_model + JSONResponse"], timings["render_reports (TypeAdapter bytes)"]
+        print(f"render_reports: {base / fast:.1f}x faster for {args.rows} rows, identical JSON: {same}")
+
+    asyncio.run(run())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+import gzip, os, threading, time, uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session, make_transient_to_detached
+from database import DATABASE_REPLICA_URLS, REPLICA_STICKY_SECONDS, dialect_insert, wants_primary
+import conditional, models
+
+DEPT_CACHE_TTL_SECONDS           = float(os.getenv("DEPT_CACHE_TTL_SECONDS", "3600"))
+DEPT_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("DEPT_CACHE_VERSION_CHECK_SECONDS", "5"))
+RESPONSE_CACHE                   = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_MAX_ENTRIES       = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES         = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# backstop only, for rows changed outside the API; the write paths invalidate by tag
+RESPONSE_CACHE_TTL_SECONDS       = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+RESPONSE_CACHE_SYNC_SECONDS      = float(os.getenv("RESPONSE_CACHE_SYNC_SECONDS", "1"))
+GZIP_MIN_BYTES    = 1024
+BROAD_TAG_AFTER   = 500    # more report ids than this invalidate the "reports" tag instead
+INVALIDATION_LAG  = 10     # seconds of the invalidation log re-read each sync, for late commits
+INVALIDATION_KEEP = 3600   # seconds of the invalidation log kept by prune()
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize, self.ttl = maxsize, ttl
+        self.hits = self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None: del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}
+
+def current_version(db: Session, name: str) -> int:
+    row = db.query(models.CacheVersion.version).filter(models.CacheVersion.name == name).first()
+    return row[0] if row else 0
+
+def bump_version(db: Session, name: str):
+    """Mark a cached table as changed for every worker; call inside the writing transaction."""
+    table = models.CacheVersion.__table__
+    db.execute(
+        dialect_insert(db, table).values(name=name, version=1)
+        .on_conflict_do_update(index_elements=[table.c.name], set_={"version": table.c.version + 1})
+    )
+
+class DepartmentCache:
+    """Whole-table snapshot of departments, served as list, by-id and by-name lookups.
+
+    Entries are detached Department objects; callers that need one in their session use
+    db.merge(dept, load=False), which costs no query. Writers call touch(db) inside their
+    transaction and invalidate() after the commit: this worker reloads on its next lookup,
+    and the other workers notice the bumped cache_versions row within
+    DEPT_CACHE_VERSION_CHECK_SECONDS.
+    """
+
+    NAME = "departments"
+
+    def __init__(self, ttl: float = DEPT_CACHE_TTL_SECONDS, check_interval: float = DEPT_CACHE_VERSION_CHECK_SECONDS):
+        self.ttl, self.check_interval = ttl, check_interval
+        self.hits = self.misses = 0
+        self._snapshot: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session) -> dict:
+        version = current_version(db, self.NAME)
+        depts = []
+        for row in db.query(models.Department.__table__).order_by(models.Department.id):
+            dept = models.Department(**row._mapping)
+            make_transient_to_detached(dept)
+            depts.append(dept)
+        now = time.monotonic()
+        return {
+            "version": version, "expires": now + self.ttl, "next_check": now + self.check_interval,
+            "list": depts, "by_id": {d.id: d for d in depts}, "by_name": {d.name: d for d in depts},
+        }
+
+    def _get(self, db: Session) -> dict:
+        now = time.monotonic()
+        snap = self._snapshot
+        if snap and now < snap["expires"]:
+            if now < snap["next_check"]:
+                self.hits += 1
+                return snap
+            if current_version(db, self.NAME) == snap["version"]:
+                snap["next_check"] = now + self.check_interval
+                self.hits += 1
+                return snap
+        self.misses += 1
+        snap = self._load(db)
+        with self._lock:
+            self._snapshot = snap
+        return snap
+
+    def all(self, db: Session) -> List[models.Department]:
+        return self._get(db)["list"]
+
+    def by_id(self, db: Session, dept_id: int) -> Optional[models.Department]:
+        return self._get(db)["by_id"].get(dept_id)
+
+    def by_name(self, db: Session, name: str) -> Optional[models.Department]:
+        return self._get(db)["by_name"].get(name)
+
+    def touch(self, db: Session):
+        bump_version(db, self.NAME)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def stats(self) -> Dict[str, float]:
+        snap, total = self._snapshot, self.hits + self.misses
+        return {"size": len(snap["list"]) if snap else 0, "hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0}
+
+department_cache = DepartmentCache()
+
+def list_tag(issue_type=None, status=None) -> str:
+    return f"list:{getattr(issue_type, 'value', issue_type) or '*'}:{getattr(status, 'value', status) or '*'}"
+
+def entering_list_tags(issue_type, status) -> Set[str]:
+    """Tags of every list_reports filter a report with this issue_type/status matches."""
+    return {list_tag(i, s) for i in (None, issue_type) for s in (None, status)}
+
+def report_tags(ids: Iterable[int]) -> Set[str]:
+    ids = set(ids)
+    return {"reports"} if len(ids) > BROAD_TAG_AFTER else {f"report:{i}" for i in ids}
+
+class ResponseCache:
+    """Serialised (and gzip-precompressed) anonymous GET responses, keyed by path plus sorted query.
+
+    Routes call lookup() before touching the database and store() with the tags of what the
+    body contains: "reports", "report:<id>", list_tag(...), "dept:<id>", "departments". Writers
+    call invalidate(db, tags) inside their transaction: the entries drop on commit here, and the
+    tags go to the cache_invalidations log that sync() replays in the other workers every
+    RESPONSE_CACHE_SYNC_SECONDS. A body whose build began before an invalidation of one of its
+    tags (or within the replica lag of one) is not stored.
+    """
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.enabled, self.max_entries, self.max_bytes, self.ttl = enabled, max_entries, max_bytes, ttl
+        self.origin = uuid.uuid4().hex
+        # replicas may serve pre-write rows for a moment after an invalidation
+        self.grace = REPLICA_STICKY_SECONDS if DATABASE_REPLICA_URLS else 0.0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = defaultdict(set)
+        self._invalidated_at: Dict[str, float] = {}
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+        self._synced_until: Optional[datetime] = None
+        self._seen_ids: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(request: Request) -> str:
+        params = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+        return request.url.path + ("?" + urlencode(params) if params else "")
+
+    def lookup(self, request: Request, route: str) -> Optional[Response]:
+        """The cached response, or None after marking the request as a fill (if cacheable)."""
+        stats = self._stats[route]
+        # signed-in bodies carry voted_by_me; callers pinned to the primary want fresh rows
+        if not self.enabled or "authorization" in request.headers or wants_primary(request):
+            stats["bypassed"] += 1
+            return None
+        key, now = self._key(request), time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= now:
+                self._drop(key); entry = None
+            if entry is None:
+                stats["misses"] += 1
+                request.state.response_cache_fill = (key, now)
+                return None
+            self._entries.move_to_end(key)
+            stats["hits"] += 1
+        headers = dict(entry["headers"])
+        if "ETag" in headers and conditional.is_fresh(request, headers["ETag"]):
+            return conditional.not_modified(headers)
+        if entry["gzip"] is not None and "gzip" in request.headers.get("accept-encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return Response(entry["gzip"], media_type="application/json", headers=headers)
+        return Response(entry["body"], media_type="application/json", headers=headers)
+
+    def store(self, request: Request, response: Response, tags: Set[str]):
+        fill = getattr(request.state, "response_cache_fill", None)
+        response.headers["Vary"] = "Authorization, Accept-Encoding"
+        if fill is None or response.status_code != 200: return
+        key, started = fill
+        body = response.body
+        compressed = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+        headers = {name: response.headers[name] for name in ("ETag", "Last-Modified", "Cache-Control", "Vary", "X-Next-Cursor") if name in response.headers}
+        size = len(body) + (len(compressed) if compressed else 0)
+        with self._lock:
+            # a write committed while this body was being built: it may predate the write
+            if any(self._invalidated_at.get(t, float("-inf")) >= started - self.grace for t in tags): return
+            if key in self._entries: self._drop(key)
+            self._entries[key] = {"body": body, "gzip": compressed, "headers": headers, "tags": tags, "size": size, "expires": time.monotonic() + self.ttl}
+            for t in tags: self._tags[t].add(key)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None: return
+        self._bytes -= entry["size"]
+        for t in entry["tags"]:
+            keys = self._tags.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys: del self._tags[t]
+
+    def drop(self, tags: Iterable[str]):
+        now = time.monotonic()
+        with self._lock:
+            for t in tags:
+                self._invalidated_at[t] = now
+                for key in list(self._tags.get(t, ())): self._drop(key)
+            if len(self._invalidated_at) > 10000:
+                horizon = now - max(self.grace, 60.0)
+                self._invalidated_at = {t: at for t, at in self._invalidated_at.items() if at >= horizon}
+
+    def invalidate(self, db: Session, tags: Iterable[str]):
+        """Drop entries carrying any of tags once db commits, in this worker and (via the log) the others."""
+        tags = set(tags)
+        if not self.enabled or not tags: return
+        db.execute(insert(models.CacheInvalidation), [{"tag": t, "origin": self.origin} for t in tags])
+        db.info.setdefault("response_cache_tags", set()).update(tags)
+
+    def sync(self, db: Session):
+        """Replay other workers' invalidations. Ids commit out of order, so re-read a short window."""
+        now = datetime.now(timezone.utc)
+        since = (self._synced_until or now) - timedelta(seconds=INVALIDATION_LAG)
+        log = models.CacheInvalidation
+        rows = db.query(log.id, log.tag, log.origin).filter(log.created_at >= since).all()
+        remote = {r.tag for r in rows if r.id not in self._seen_ids and r.origin != self.origin}
+        self._seen_ids.update((r.id, now) for r in rows)
+        self._seen_ids = {i: at for i, at in self._seen_ids.items() if at >= now - timedelta(seconds=2 * INVALIDATION_LAG)}
+        self._synced_until = now
+        if remote: self.drop(remote)
+
+    def prune(self, db: Session):
+        db.query(models.CacheInvalidation).filter(
+            models.CacheInvalidation.created_at < datetime.now(timezone.utc) - timedelta(seconds=INVALIDATION_KEEP)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear(); self._tags.clear(); self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        routes = {}
+        for route, s in list(self._stats.items()):
+            looked_up = s["hits"] + s["misses"]
+            routes[route] = {**s, "hit_ratio": s["hits"] / looked_up if looked_up else 0.0}
+        return {"enabled": self.enabled, "entries": len(self._entries), "bytes": self._bytes, "routes": routes}
+
+response_cache = ResponseCache()
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_tags(session):
+    tags = session.info.pop("response_cache_tags", None)
+    if tags: response_cache.drop(tags)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tags(session):
+    session.info.pop("response_cache_tags", None)
@@ -0,0 +1,93 @@
+from collections import defaultdict
+from typing import Iterable, List
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from database import dialect_insert
+import geo, models
+
+MAX_CLUSTER_CELLS = 500   # keeps the response a few KB at any zoom
+
+def _rows(report: models.Report, status, delta: int) -> List[dict]:
+    return [
+        {"level": level, "cell": geo.cell_id(report.latitude, report.longitude, size),
+         "issue_type": report.issue_type, "status": status,
+         "count": delta, "sum_lat": delta * report.latitude, "sum_lon": delta * report.longitude}
+        for level, size in geo.CLUSTER_LEVELS.items()
+    ]
+
+def _apply(db: Session, rows: List[dict]):
+    # one cached upsert, executed for all rows at once (keys must be unique within rows), in
+    # primary-key order so concurrent writers lock shared rows in the same order and cannot deadlock
+    rows = sorted(rows, key=lambda r: (r["level"], r["cell"], r["issue_type"], r["status"]))
+    table = models.ReportCluster.__table__
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.level, table.c.cell, table.c.issue_type, table.c.status],
+        set_={
+            "count":   table.c.count + stmt.excluded.count,
+            "sum_lat": table.c.sum_lat + stmt.excluded.sum_lat,
+            "sum_lon": table.c.sum_lon + stmt.excluded.sum_lon,
+        },
+    )
+    db.execute(stmt, rows)
+
+def record_created(db: Session, report: models.Report):
+    """Count a new report into every cluster level; runs inside the creating transaction."""
+    _apply(db, _rows(report, report.status, 1))
+
+def record_status_change(db: Session, report: models.Report, old_status, new_status):
+    if old_status == new_status: return
+    _apply(db, _rows(report, old_status, -1) + _rows(report, new_status, 1))
+
+def record_status_changes(db: Session, reports: Iterable, new_status):
+    """record_status_change for many reports (rows still carrying their old status), summed per cluster row."""
+    totals = {}
+    for report in reports:
+        if report.status == new_status: continue
+        for r in _rows(report, report.status, -1):
+            # same cells either way: mirror the -1 row into the new status
+            _add(totals, r); _add(totals, dict(r, status=new_status, count=1, sum_lat=-r["sum_lat"], sum_lon=-r["sum_lon"]))
+    if totals: _apply(db, list(totals.values()))
+
+def _add(totals: dict, r: dict):
+    key = (r["level"], r["cell"], r["issue_type"], r["status"])
+    if key in totals:
+        t = totals[key]; t["count"] += r["count"]; t["sum_lat"] += r["sum_lat"]; t["sum_lon"] += r["sum_lon"]
+    else:
+        totals[key] = dict(r)
+
+def rebuild(db: Session):
+    """Recompute every aggregate from the reports table (first start or manual repair)."""
+    db.query(models.ReportCluster).delete()
+    totals = {}
+    cols = (models.Report.latitude, models.Report.longitude, models.Report.issue_type, models.Report.status)
+    for row in db.query(*cols).yield_per(5000):
+        for r in _rows(row, row.status, 1): _add(totals, r)
+    if totals:
+        db.bulk_insert_mappings(models.ReportCluster, list(totals.values()))
+    db.commit()
+
+def query(db: Session, bbox: geo.BBox, zoom: int) -> List[dict]:
+    level = geo.cluster_level(zoom)
+    q = db.query(models.ReportCluster).filter(models.ReportCluster.level == level, models.ReportCluster.count > 0)
+    size, cell = geo.CLUSTER_LEVELS[level], models.ReportCluster.cell
+    ranges = geo.cell_ranges(bbox, size, max_rows=256)
+    if ranges is None:
+        # too many rows to list: one id range spanning them, columns picked out arithmetically
+        (row0, row1), (col0, col1), cols = geo.cell_window(bbox, size)
+        q = q.filter(cell.between(row0 * cols, row1 * cols + cols - 1), (cell % cols).between(col0, col1))
+    else:
+        q = q.filter(or_(*[cell.between(lo, hi) for lo, hi in ranges]))
+    cells = defaultdict(lambda: {"count": 0, "sum_lat": 0.0, "sum_lon": 0.0, "by_issue_type": defaultdict(int), "by_status": defaultdict(int)})
+    for row in q:
+        c = cells[row.cell]
+        c["count"] += row.count; c["sum_lat"] += row.sum_lat; c["sum_lon"] += row.sum_lon
+        c["by_issue_type"][row.issue_type.value] += row.count
+        c["by_status"][row.status.value] += row.count
+    out = [
+        {"cell": cell, "count": c["count"], "latitude": c["sum_lat"] / c["count"], "longitude": c["sum_lon"] / c["count"],
+         "by_issue_type": dict(c["by_issue_type"]), "by_status": dict(c["by_status"])}
+        for cell, c in cells.items()
+    ]
+    out.sort(key=lambda c: c["count"], reverse=True)
+    return out[:MAX_CLUSTER_CELLS]
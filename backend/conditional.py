@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import models
+
+# Conditional GET for report reads. Validators come from a one-row version query, so a
+# revalidation that ends in 304 never loads or serialises reports. Bodies carry voted_by_me,
+# so tags include the caller and responses are marked Vary: Authorization.
+
+def make_etag(*parts) -> str:
+    # weak: derived from row versions, not from the response bytes
+    return 'W/"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+
+def report_version(db: Session, report_id: int, user_id: Optional[int] = None):
+    """(etag, last_modified) for one report, or None if it does not exist.
+
+    updated_at moves on every UPDATE of the row (votes, status, priority, hotspot flags); the
+    upvote count and history length also go in because SQLite timestamps are whole seconds.
+    """
+    history = select(func.count(models.StatusHistory.id)).where(models.StatusHistory.report_id == models.Report.id).scalar_subquery()
+    columns = [models.Report.created_at, models.Report.updated_at, models.Report.upvote_count, models.Report.status, history]
+    if user_id is not None:
+        columns.append(select(models.Vote.id).where(models.Vote.report_id == models.Report.id, models.Vote.user_id == user_id).exists())
+    row = db.query(*columns).filter(models.Report.id == report_id).first()
+    if row is None: return None
+    last_modified = models.utc(row.updated_at or row.created_at)
+    return make_etag("report", report_id, user_id, *row), last_modified
+
+def page_version(db: Session, page_query, request: Request, user_id: Optional[int] = None) -> str:
+    """ETag for a list page: count, newest change, id sum and vote total over exactly the page's rows.
+
+    page_query is the page's filtered, ordered and limited report query; only four columns of
+    it are read. The query string is part of the tag, since view/fields change the body.
+    """
+    page = page_query.with_entities(models.Report.id, models.Report.created_at, models.Report.updated_at, models.Report.upvote_count).subquery()
+    version = db.query(
+        func.count(), func.max(func.coalesce(page.c.updated_at, page.c.created_at)), func.sum(page.c.id), func.sum(page.c.upvote_count),
+    ).select_from(page).one()
+    return make_etag("reports", request.url.path, request.url.query, user_id, *version)
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2); tags compare weakly
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and last_modified.replace(microsecond=0) <= since
+    return False
+
+def validators(etag: str, last_modified: Optional[datetime] = None, private: bool = False) -> dict:
+    # no-cache: browsers may keep the body but must revalidate, which is what makes polling cheap
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache" if private else "no-cache", "Vary": "Authorization"}
+    if last_modified is not None: headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,12 @@
+import os, tempfile
+
+# the app reads its settings at import: point it at a throwaway database before any test imports it
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'tests.db')}"
+# nothing but the request under test may touch the database (query counts); tests that
+# exercise the response cache switch it on themselves
+os.environ["BACKGROUND_JOBS"] = "0"
+os.environ["RESPONSE_CACHE"] = "0"
+os.environ["DUPLICATE_SYNC_SECONDS"] = "3600"
+
+collect_ignore = ["temp_test"]
@@ -0,0 +1,76 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from database import dialect_insert
+import models
+
+SCOPES = ("all", "user", "department", "ward")
+CLOSED_STATUSES = (models.StatusEnum.resolved, models.StatusEnum.rejected)
+
+def _keys(report: models.Report) -> List[tuple]:
+    keys = [("all", ""), ("user", str(report.user_id))]
+    if report.department_id is not None: keys.append(("department", str(report.department_id)))
+    if report.ward: keys.append(("ward", report.ward))
+    return keys
+
+def _rows(report: models.Report, status, delta: int) -> List[dict]:
+    return [{"scope": scope, "scope_key": key, "status": status, "count": delta} for scope, key in _keys(report)]
+
+def _apply(db: Session, rows: List[dict]):
+    table = models.ReportCounter.__table__
+    stmt = dialect_insert(db, table)
+    # primary-key order, so writers sharing counter rows (the "all" scope, above all) lock them alike
+    rows = sorted(rows, key=lambda r: (r["scope"], r["scope_key"], r["status"]))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.scope, table.c.scope_key, table.c.status],
+        set_={"count": table.c.count + stmt.excluded.count},
+    ), rows)
+
+def record_created(db: Session, report: models.Report):
+    """Count a new report for every scope it belongs to; runs inside the creating transaction."""
+    _apply(db, _rows(report, report.status, 1))
+
+def record_status_change(db: Session, report: models.Report, old_status, new_status):
+    if old_status == new_status: return
+    _apply(db, _rows(report, old_status, -1) + _rows(report, new_status, 1))
+
+def record_status_changes(db: Session, reports: Iterable, new_status):
+    """record_status_change for many reports (rows still carrying their old status), summed per counter."""
+    totals = defaultdict(int)
+    for report in reports:
+        if report.status == new_status: continue
+        for scope, key in _keys(report):
+            totals[scope, key, report.status] -= 1; totals[scope, key, new_status] += 1
+    rows = [{"scope": scope, "scope_key": key, "status": status, "count": n} for (scope, key, status), n in totals.items() if n]
+    if rows: _apply(db, rows)
+
+def rebuild(db: Session):
+    """Recompute every counter from the reports table (first start or manual repair)."""
+    db.query(models.ReportCounter).delete()
+    totals = defaultdict(int)
+    cols = (models.Report.user_id, models.Report.department_id, models.Report.ward, models.Report.status)
+    for row in db.query(*cols, func.count()).group_by(*cols):
+        for scope, key in _keys(row):
+            totals[scope, key, row.status] += row[-1]
+    if totals:
+        db.bulk_insert_mappings(models.ReportCounter, [
+            {"scope": scope, "scope_key": key, "status": status, "count": count} for (scope, key, status), count in totals.items()
+        ])
+    db.commit()
+
+def _summary(by_status: Dict[str, int]) -> dict:
+    total = sum(by_status.values())
+    closed = sum(by_status.get(s.value, 0) for s in CLOSED_STATUSES)
+    return {"total": total, "pending": total - closed, "by_status": by_status}
+
+def query(db: Session, scope: str, key: Optional[str] = None) -> Dict[str, dict]:
+    """Summaries for one scope, keyed by scope_key; only the given key when one is passed."""
+    q = db.query(models.ReportCounter.scope_key, models.ReportCounter.status, models.ReportCounter.count).filter(
+        models.ReportCounter.scope == scope, models.ReportCounter.count != 0)
+    if key is not None: q = q.filter(models.ReportCounter.scope_key == key)
+    grouped = defaultdict(dict)
+    for row in q:
+        grouped[row.scope_key][row.status.value] = row.count
+    if key is not None and key not in grouped: grouped[key] = {}
+    return {k: _summary(v) for k, v in grouped.items()}
@@ -0,0 +1,104 @@
+import logging, math, os, threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+import geo, models, services
+
+DUPLICATE_RADIUS_M     = float(os.getenv("DUPLICATE_RADIUS_M", "50"))
+DUPLICATE_WINDOW_HOURS = float(os.getenv("DUPLICATE_WINDOW_HOURS", "72"))
+DUPLICATE_SYNC_SECONDS = float(os.getenv("DUPLICATE_SYNC_SECONDS", "15"))   # how stale other workers' reports may be
+
+logger = logging.getLogger(__name__)
+
+class DuplicateIndex:
+    """In-memory grid of open canonical reports, bucketed by (issue_type, row, col).
+
+    Cells are one search radius tall, so a lookup only visits the neighbouring cells
+    around the new point and never touches the reports table. Each worker tracks its own writes
+    at once and pulls everyone else's every DUPLICATE_SYNC_SECONDS via the updated_at index.
+    """
+
+    def __init__(self, radius_m: float = DUPLICATE_RADIUS_M, window_hours: float = DUPLICATE_WINDOW_HOURS):
+        self.radius_m = radius_m
+        self.window   = timedelta(hours=window_hours)
+        self.cell_deg = radius_m / geo.METERS_PER_DEG
+        self._cells: Dict[Tuple, Dict[int, Tuple[float, float, datetime]]] = {}
+        self._where: Dict[int, Tuple] = {}
+        self._lock  = threading.Lock()
+        self.synced_at: Optional[datetime] = None
+
+    def _key(self, issue_type, lat: float, lon: float) -> Tuple:
+        return (issue_type, math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def load(self, db: Session):
+        """Seed from open, non-duplicate reports inside the time window."""
+        started = datetime.now(timezone.utc)
+        since = started - self.window
+        rows = db.query(models.Report.id, models.Report.issue_type, models.Report.latitude, models.Report.longitude, models.Report.created_at).filter(
+            models.Report.created_at >= since,
+            models.Report.status.in_(services.OPEN_STATUSES),
+            models.Report.is_duplicate.is_(False),
+        )
+        with self._lock:
+            self._cells.clear(); self._where.clear()
+            for row in rows.yield_per(5000):
+                self._add(row.id, row.issue_type, row.latitude, row.longitude, row.created_at)
+        # small overlap so rows committed while this was reading are picked up by refresh()
+        self.synced_at = started - timedelta(seconds=5)
+        logger.info("Duplicate index loaded with %d open reports", len(self._where))
+
+    def refresh(self, db: Session):
+        """Apply reports created or changed since the last load/refresh, by any worker."""
+        if self.synced_at is None: return self.load(db)
+        started = datetime.now(timezone.utc)
+        rows = db.query(
+            models.Report.id, models.Report.issue_type, models.Report.latitude, models.Report.longitude,
+            models.Report.created_at, models.Report.status, models.Report.is_duplicate,
+        ).filter(or_(models.Report.created_at > self.synced_at, models.Report.updated_at > self.synced_at)).all()
+        db.rollback()
+        with self._lock:
+            for row in rows: self._track(row)
+        self.synced_at = started - timedelta(seconds=5)
+
+    def _add(self, report_id: int, issue_type, lat: float, lon: float, created_at):
+        key = self._key(issue_type, lat, lon)
+        self._cells.setdefault(key, {})[report_id] = (lat, lon, models.utc(created_at) or datetime.now(timezone.utc))
+        self._where[report_id] = key
+
+    def _remove(self, report_id: int):
+        key = self._where.pop(report_id, None)
+        if key is None: return
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.pop(report_id, None)
+            if not bucket: del self._cells[key]
+
+    def sync(self, report: models.Report):
+        """Track a report as a canonical candidate while it is open and not itself a duplicate."""
+        with self._lock: self._track(report)
+
+    def _track(self, report):
+        self._remove(report.id)
+        if report.status in services.OPEN_STATUSES and not report.is_duplicate:
+            self._add(report.id, report.issue_type, report.latitude, report.longitude, report.created_at)
+
+    def find(self, issue_type, lat: float, lon: float) -> Optional[int]:
+        """Oldest open report of the same type within radius and window, or None."""
+        now = datetime.now(timezone.utc)
+        _, row, col = self._key(issue_type, lat, lon)
+        dcol = geo.lon_cells(lat)
+        best, best_at, expired = None, None, []
+        with self._lock:
+            for r in range(row - 1, row + 2):
+                for c in range(col - dcol, col + dcol + 1):
+                    for report_id, (rlat, rlon, created_at) in self._cells.get((issue_type, r, c), {}).items():
+                        if now - created_at > self.window:
+                            expired.append(report_id); continue
+                        if geo.distance_m(lat, lon, rlat, rlon) <= self.radius_m and (best_at is None or created_at < best_at):
+                            best, best_at = report_id, created_at
+            for report_id in expired:
+                self._remove(report_id)
+        return best
+
+index = DuplicateIndex()
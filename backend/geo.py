@@ -0,0 +1,73 @@
+import math
+from typing import List, Optional, Tuple
+
+# Fixed lat/lon grid used to index report coordinates with a plain B-tree column,
+# so viewport queries work on stock Postgres and SQLite without PostGIS.
+GRID_CELL_DEG  = 0.01   # ~1.1 km of latitude
+MAX_ROW_RANGES = 64     # wider boxes fall back to the plain lat/lon range filter
+EARTH_RADIUS_M = 6_371_000
+METERS_PER_DEG = 111_320   # one degree of latitude
+
+# Marker-cluster grids: map zoom -> cell size, about 40 cells across a typical viewport at that zoom.
+CLUSTER_LEVELS = {zoom: 360 / 2 ** (zoom + 3) for zoom in (2, 5, 8, 11, 14)}
+
+BBox = Tuple[float, float, float, float]   # (min_lon, min_lat, max_lon, max_lat)
+
+def _row_col(lat: float, lon: float, size: float) -> Tuple[int, int]:
+    rows, cols = math.ceil(180 / size), math.ceil(360 / size)
+    row = min(max(int(math.floor((lat + 90) / size)), 0), rows - 1)
+    col = min(max(int(math.floor((lon + 180) / size)), 0), cols - 1)
+    return row, col
+
+def cell_id(lat: float, lon: float, size: float = GRID_CELL_DEG) -> int:
+    # row-major, so every grid row of a bounding box is one contiguous id range
+    row, col = _row_col(lat, lon, size)
+    return row * math.ceil(360 / size) + col
+
+def cell_window(bbox: BBox, size: float = GRID_CELL_DEG) -> Tuple[Tuple[int, int], Tuple[int, int], int]:
+    """((first row, last row), (first col, last col), cols per row) of the cells covering bbox."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    row0, col0 = _row_col(min_lat, min_lon, size)
+    row1, col1 = _row_col(max_lat, max_lon, size)
+    return (row0, row1), (col0, col1), math.ceil(360 / size)
+
+def cell_ranges(bbox: BBox, size: float = GRID_CELL_DEG, max_rows: int = MAX_ROW_RANGES) -> Optional[List[Tuple[int, int]]]:
+    """Inclusive (lo, hi) cell-id ranges covering bbox, one per grid row, or None if it spans too many rows."""
+    (row0, row1), (col0, col1), cols = cell_window(bbox, size)
+    if row1 - row0 + 1 > max_rows:
+        return None
+    return [(row * cols + col0, row * cols + col1) for row in range(row0, row1 + 1)]
+
+def parse_bbox(raw: str) -> BBox:
+    """Parse "minLon,minLat,maxLon,maxLat"; raises ValueError on malformed or inverted boxes."""
+    parts = [float(p) for p in raw.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox is out of range or crosses the antimeridian")
+    return min_lon, min_lat, max_lon, max_lat
+
+def cluster_level(zoom: int) -> int:
+    # finest grid level at or below the requested zoom
+    return max([z for z in CLUSTER_LEVELS if z <= zoom], default=min(CLUSTER_LEVELS))
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # haversine, metres
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def neighbor_cells(cell: int, rings: int = 1, size: float = GRID_CELL_DEG) -> List[int]:
+    """Cell ids within `rings` cells of `cell` (itself included), wrapping at the antimeridian."""
+    rows, cols = math.ceil(180 / size), math.ceil(360 / size)
+    row, col = divmod(cell, cols)
+    return [
+        r * cols + (col + dc) % cols
+        for r in range(max(row - rings, 0), min(row + rings, rows - 1) + 1)
+        for dc in range(-rings, rings + 1)
+    ]
+
+def lon_cells(lat: float) -> int:
+    # square-degree cells get narrower towards the poles: columns to scan either side for one cell of latitude
+    return math.ceil(1 / max(math.cos(math.radians(lat)), 0.01))
@@ -0,0 +1,91 @@
+import asyncio, logging, math, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt is ~200 ms of CPU per call: run it in worker processes so it neither holds a threadpool
+# slot nor the GIL, and shed load with a fast 503 once HASH_QUEUE_SIZE calls are in flight.
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+HASH_QUEUE_SIZE   = int(os.getenv("HASH_QUEUE_SIZE", "64"))
+# cost: BCRYPT_ROUNDS pins it; otherwise BCRYPT_TARGET_MS > 0 calibrates the highest cost whose
+# hash fits that budget on this machine at start-up; otherwise passlib's default (12)
+BCRYPT_ROUNDS     = int(os.getenv("BCRYPT_ROUNDS", "0")) or None
+BCRYPT_TARGET_MS  = float(os.getenv("BCRYPT_TARGET_MS", "0"))
+MIN_ROUNDS, MAX_ROUNDS = 10, 16
+
+logger = logging.getLogger(__name__)
+
+def make_context(rounds: Optional[int] = None) -> CryptContext:
+    extra = {"bcrypt_sha256__rounds": rounds} if rounds else {}
+    return CryptContext(schemes=["bcrypt_sha256"], deprecated="auto", **extra)
+
+# in-process context for scripts and sync callers; verify accepts hashes of any cost
+pwd_context = make_context(BCRYPT_ROUNDS)
+
+def calibrate_rounds(target_ms: float) -> int:
+    """Highest bcrypt cost whose single hash stays within target_ms here (each +1 doubles the work)."""
+    ctx = make_context(MIN_ROUNDS)
+    ctx.hash("calibration")   # warm-up
+    t0 = time.perf_counter(); ctx.hash("calibration")
+    base_ms = (time.perf_counter() - t0) * 1000
+    extra = math.floor(math.log2(target_ms / base_ms)) if target_ms > base_ms else 0
+    return min(MIN_ROUNDS + extra, MAX_ROUNDS)
+
+# --- worker-process side -------------------------------------------------------------------
+_worker_context: Optional[CryptContext] = None
+
+def _init_worker(rounds: Optional[int]):
+    global _worker_context
+    _worker_context = make_context(rounds)
+
+def _hash(password: str) -> str:
+    return _worker_context.hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    return _worker_context.verify(password, hashed)
+
+# --- API-process side ----------------------------------------------------------------------
+class HashPool:
+    def __init__(self, workers: int = HASH_POOL_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        self.workers, self.queue_size = workers, queue_size
+        self.rounds: Optional[int] = None
+        self.in_flight = self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        self.rounds = BCRYPT_ROUNDS or (calibrate_rounds(BCRYPT_TARGET_MS) if BCRYPT_TARGET_MS > 0 else None)
+        # spawn, not fork: the API process already runs an event loop and threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.rounds,),
+        )
+        logger.info("Password hashing pool: %d workers, queue %d, bcrypt cost %s", self.workers, self.queue_size, self.rounds or "default")
+
+    def shutdown(self):
+        if self._executor: self._executor.shutdown(cancel_futures=True)
+        self._executor = None
+
+    async def _submit(self, fn, *args):
+        if self._executor is None: self.start()
+        # in_flight is only touched on the event loop thread
+        if self.in_flight >= self.queue_size:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Authentication is busy, retry shortly", headers={"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "queue_size": self.queue_size, "in_flight": self.in_flight,
+                "rejected": self.rejected, "bcrypt_rounds": self.rounds}
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(_verify, password, hashed)
+
+pool = HashPool()
@@ -0,0 +1,98 @@
+import logging, math, os, time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+import geo, models, services
+from cache import report_tags, response_cache
+
+# Density-based hotspots: an open report is "core" when HOTSPOT_MIN_REPORTS open reports of the
+# same issue_type (itself included) lie within HOTSPOT_RADIUS_M; cores and their neighbours are
+# hotspots. The radius must stay well under half a geo.GRID_CELL_DEG cell (~550 m at 60 degrees).
+HOTSPOT_RADIUS_M         = float(os.getenv("HOTSPOT_RADIUS_M", "150"))
+HOTSPOT_MIN_REPORTS      = int(os.getenv("HOTSPOT_MIN_REPORTS", "5"))
+HOTSPOT_INTERVAL_SECONDS = float(os.getenv("HOTSPOT_INTERVAL_SECONDS", "300"))
+
+CELL_CHUNK   = 100    # touched grid cells evaluated per query
+UPDATE_BATCH = 1000   # ids per UPDATE ... WHERE id IN (...)
+
+logger = logging.getLogger(__name__)
+
+def _dense(points: List, radius_m: float, min_reports: int) -> Set[int]:
+    """Ids of core points and the points within radius of a core."""
+    cell_deg = radius_m / geo.METERS_PER_DEG
+    grid = defaultdict(list)
+    for p in points:
+        grid[(math.floor(p.latitude / cell_deg), math.floor(p.longitude / cell_deg))].append(p)
+    neighbours = {}
+    for p in points:
+        row, col, dcol = math.floor(p.latitude / cell_deg), math.floor(p.longitude / cell_deg), geo.lon_cells(p.latitude)
+        neighbours[p.id] = [
+            q.id for r in range(row - 1, row + 2) for c in range(col - dcol, col + dcol + 1)
+            for q in grid.get((r, c), ()) if geo.distance_m(p.latitude, p.longitude, q.latitude, q.longitude) <= radius_m
+        ]
+    hot = set()
+    for pid, near in neighbours.items():
+        if len(near) >= min_reports:
+            hot.update(near)
+    return hot
+
+def _set_flag(db: Session, ids: List[int], value: bool):
+    for i in range(0, len(ids), UPDATE_BATCH):
+        db.query(models.Report).filter(models.Report.id.in_(ids[i:i + UPDATE_BATCH])).update({"is_hotspot": value}, synchronize_session=False)
+
+class HotspotJob:
+    """Re-evaluates only the grid cells whose reports were created or changed since the last run.
+
+    The first run after start-up has nothing to compare against and evaluates every cell holding
+    open or flagged reports once.
+    """
+
+    def __init__(self, radius_m: float = HOTSPOT_RADIUS_M, min_reports: int = HOTSPOT_MIN_REPORTS):
+        self.radius_m    = radius_m
+        self.min_reports = min_reports
+        self.last_run: Optional[datetime] = None
+
+    def _touched_cells(self, db: Session, since: Optional[datetime]) -> Dict[str, Set[int]]:
+        q = db.query(models.Report.issue_type, models.Report.grid_cell).filter(models.Report.grid_cell.isnot(None))
+        if since is None:
+            q = q.filter(or_(models.Report.status.in_(services.OPEN_STATUSES), models.Report.is_hotspot.is_(True)))
+        else:
+            q = q.filter(or_(models.Report.created_at > since, models.Report.updated_at > since))
+        touched = defaultdict(set)
+        for issue_type, cell in q.distinct():
+            touched[issue_type].add(cell)
+        return touched
+
+    def _evaluate(self, db: Session, issue_type, cells: Iterable[int]) -> int:
+        # a change can flip points up to two radii away: re-flag the touched cells plus one
+        # ring, using data from one ring further out
+        affected = {n for c in cells for n in geo.neighbor_cells(c)}
+        loaded   = {n for c in affected for n in geo.neighbor_cells(c)}
+        rows = db.query(
+            models.Report.id, models.Report.latitude, models.Report.longitude,
+            models.Report.status, models.Report.is_hotspot, models.Report.grid_cell,
+        ).filter(models.Report.issue_type == issue_type, models.Report.grid_cell.in_(loaded)).all()
+        hot = _dense([r for r in rows if r.status in services.OPEN_STATUSES], self.radius_m, self.min_reports)
+        on  = [r.id for r in rows if r.grid_cell in affected and r.id in hot and not r.is_hotspot]
+        off = [r.id for r in rows if r.grid_cell in affected and r.id not in hot and r.is_hotspot]
+        _set_flag(db, on, True); _set_flag(db, off, False)
+        response_cache.invalidate(db, report_tags(on + off))
+        return len(on) + len(off)
+
+    def run(self, db: Session):
+        started, t0 = datetime.now(timezone.utc), time.perf_counter()
+        touched = self._touched_cells(db, self.last_run)
+        flipped = 0
+        for issue_type, cells in touched.items():
+            cells = sorted(cells)
+            for i in range(0, len(cells), CELL_CHUNK):
+                flipped += self._evaluate(db, issue_type, cells[i:i + CELL_CHUNK])
+        db.commit()
+        # small overlap so rows committed while this run was reading are not missed
+        self.last_run = started - timedelta(seconds=5)
+        logger.info("Hotspot job: %d cells re-evaluated, %d reports flipped in %.2fs",
+                    sum(len(c) for c in touched.values()), flipped, time.perf_counter() - t0)
+
+job = HotspotJob()
@@ -0,0 +1,45 @@
+import asyncio, logging, os
+from typing import Callable, List, Tuple
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import SessionLocal
+
+# Periodic maintenance jobs run inside the API process. With several uvicorn workers,
+# leave BACKGROUND_JOBS=1 on one of them only.
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "1") == "1"
+
+logger = logging.getLogger(__name__)
+
+class Scheduler:
+    def __init__(self):
+        self._jobs: List[Tuple[str, float, Callable[[Session], None]]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def every(self, seconds: float, fn: Callable[[Session], None], name: str = None):
+        """Run fn(db) every `seconds` on the threadpool with its own session."""
+        self._jobs.append((name or fn.__qualname__, seconds, fn))
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._loop(*job)) for job in self._jobs]
+
+    async def stop(self):
+        for task in self._tasks: task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._jobs, self._tasks = [], []
+
+    async def _loop(self, name: str, seconds: float, fn: Callable[[Session], None]):
+        while True:
+            await asyncio.sleep(seconds)
+            try:
+                await run_in_threadpool(run_job, fn)
+            except Exception:
+                logger.exception("Background job %s failed", name)
+
+def run_job(fn: Callable[[Session], None]):
+    db = SessionLocal()
+    try:
+        fn(db)
+    finally:
+        db.close()
+
+scheduler = Scheduler()
@@ -1,17 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-import logging
+from fastapi.responses import JSONResponse, ORJSONResponse
+import asyncio, logging
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, reports, departments, votes
+from starlette.concurrency import run_in_threadpool
+import database
+from database import engine, Base, SessionLocal
+from routers import admin, auth, live, reports, departments, stats, votes
+import cache, clusters, counters, duplicates, hashing, hotspots, jobs, migrations, models, pubsub, rescoring, sla, vote_buffer
 
 Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="CivicTrack API", version="1.0.0")
+migrations.upgrade(engine)
 
 logger = logging.getLogger("uvicorn.error")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = SessionLocal()
+    try:
+        # seed the marker-cluster aggregates once for databases that predate them
+        if not db.query(models.ReportCluster).first() and db.query(models.Report).first():
+            logger.info("Building report cluster aggregates")
+            clusters.rebuild(db)
+        if not db.query(models.ReportCounter).first() and db.query(models.Report).first():
+            logger.info("Building report counters")
+            counters.rebuild(db)
+        duplicates.index.load(db)
+    finally:
+        db.close()
+    if jobs.BACKGROUND_JOBS:
+        jobs.scheduler.every(hotspots.HOTSPOT_INTERVAL_SECONDS, hotspots.job.run, "hotspots")
+        jobs.scheduler.every(rescoring.PRIORITY_RESCORE_INTERVAL_SECONDS, rescoring.rescore_open_reports, "priority-rescore")
+        jobs.scheduler.every(sla.SLA_CHECK_INTERVAL_SECONDS, sla.monitor.tick, "sla-monitor")
+    # each worker's duplicate index only sees its own writes as they happen; pull the rest
+    jobs.scheduler.every(duplicates.DUPLICATE_SYNC_SECONDS, duplicates.index.refresh, "duplicate-index-sync")
+    if cache.response_cache.enabled:
+        # every worker replays the others' invalidations; one prunes the shared log
+        jobs.scheduler.every(cache.RESPONSE_CACHE_SYNC_SECONDS, cache.response_cache.sync, "response-cache-sync")
+        if jobs.BACKGROUND_JOBS:
+            jobs.scheduler.every(600, cache.response_cache.prune, "response-cache-prune")
+    if vote_buffer.VOTE_WRITE_BEHIND:
+        # every worker buffers its own votes, so every worker flushes
+        jobs.scheduler.every(vote_buffer.VOTE_FLUSH_INTERVAL_MS / 1000, vote_buffer.buffer.flush, "vote-flush")
+        # only buffered counts can drift: the direct path increments in the vote's own transaction
+        if jobs.BACKGROUND_JOBS:
+            jobs.scheduler.every(vote_buffer.VOTE_RECONCILE_INTERVAL_SECONDS, vote_buffer.reconciler.run, "vote-reconcile")
+    jobs.scheduler.start()
+    hashing.pool.start()
+    pubsub.hub.bind(asyncio.get_running_loop())
+    yield
+    await jobs.scheduler.stop()
+    hashing.pool.shutdown()
+    if vote_buffer.VOTE_WRITE_BEHIND:
+        await run_in_threadpool(jobs.run_job, vote_buffer.buffer.flush)
+    if database.DB_ASYNC:
+        await database.async_engine.dispose()
+
+app = FastAPI(title="CivicTrack API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -22,16 +69,23 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         logger.exception("Failed to log validation error body")
     return JSONResponse(status_code=422, content={"detail": exc.errors()})
 
+if database.DATABASE_REPLICA_URLS:
+    app.add_middleware(database.ReadYourWritesMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:3000"],
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth.router,        prefix="/api/auth",        tags=["Auth"])
 app.include_router(reports.router,     prefix="/api/reports",     tags=["Reports"])
 app.include_router(departments.router, prefix="/api/departments", tags=["Departments"])
 app.include_router(votes.router,       prefix="/api/votes",       tags=["Votes"])
+app.include_router(admin.router,       prefix="/api/admin",       tags=["Admin"])
+app.include_router(stats.router,       prefix="/api/stats",       tags=["Stats"])
+app.include_router(live.router,        prefix="/api/live",        tags=["Live"])
 
 @app.get("/")
 def root(): return {"message": "CivicTrack API is running"}
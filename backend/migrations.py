@@ -0,0 +1,72 @@
+import logging
+from typing import Set
+from sqlalchemy import bindparam, func, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
+from database import Base
+import geo, models
+
+# create_all() only creates missing tables. Columns, indexes and constraints added to existing
+# tables since are brought in here at start-up; every step checks first, so reruns are no-ops.
+BACKFILL_BATCH = 5000
+VOTE_UNIQUE = "uq_votes_user_report"
+
+logger = logging.getLogger(__name__)
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        added = _add_columns(conn)
+        _ensure_vote_uniqueness(conn)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes: index.create(conn, checkfirst=True)
+        if "reports.ward" in added:
+            # best effort for old reports: the reporter's ward now
+            users = models.User.__table__
+            conn.execute(update(models.Report.__table__).where(models.Report.__table__.c.ward.is_(None)).values(
+                ward=select(users.c.ward).where(users.c.id == models.Report.__table__.c.user_id).scalar_subquery()))
+    if "reports.grid_cell" in added: _backfill_grid_cells(engine)
+
+def _add_columns(conn) -> Set[str]:
+    insp, added = inspect(conn), set()
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name): continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing: continue
+            spec = str(CreateColumn(column).compile(dialect=conn.dialect))
+            for fk in column.foreign_keys:
+                spec += f" REFERENCES {fk.column.table.name} ({fk.column.name})"
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {spec}"))
+            added.add(f"{table.name}.{column.name}")
+            logger.info("Added column %s.%s", table.name, column.name)
+    return added
+
+def _ensure_vote_uniqueness(conn):
+    """One vote per (user, report): the ON CONFLICT target of the vote endpoint."""
+    insp = inspect(conn)
+    names = {c["name"] for c in insp.get_unique_constraints("votes")} | {i["name"] for i in insp.get_indexes("votes")}
+    if VOTE_UNIQUE in names: return
+    votes, reports = models.Vote.__table__, models.Report.__table__
+    # keep each pair's first vote, then re-derive the counters the duplicates inflated
+    first = select(func.min(votes.c.id)).group_by(votes.c.user_id, votes.c.report_id)
+    removed = conn.execute(votes.delete().where(votes.c.id.not_in(first))).rowcount
+    if removed:
+        actual = select(func.count(votes.c.id)).where(votes.c.report_id == reports.c.id).scalar_subquery()
+        conn.execute(update(reports).where(func.coalesce(reports.c.upvote_count, 0) != actual).values(upvote_count=actual))
+        logger.warning("Removed %d duplicate votes before adding %s", removed, VOTE_UNIQUE)
+    if conn.dialect.name == "sqlite":
+        # SQLite cannot add constraints to an existing table; a unique index serves ON CONFLICT the same way
+        conn.execute(text(f"CREATE UNIQUE INDEX {VOTE_UNIQUE} ON votes (user_id, report_id)"))
+    else:
+        conn.execute(text(f"ALTER TABLE votes ADD CONSTRAINT {VOTE_UNIQUE} UNIQUE (user_id, report_id)"))
+    logger.info("Added %s", VOTE_UNIQUE)
+
+def _backfill_grid_cells(engine):
+    reports = models.Report.__table__
+    stmt = update(reports).where(reports.c.id == bindparam("b_id")).values(grid_cell=bindparam("b_cell"))
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(reports.c.id, reports.c.latitude, reports.c.longitude).where(reports.c.grid_cell.is_(None)).limit(BACKFILL_BATCH)
+            ).all()
+            if not rows: return
+            conn.execute(stmt, [{"b_id": r.id, "b_cell": geo.cell_id(r.latitude, r.longitude)} for r in rows])
@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Text, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Enum, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from datetime import datetime, timezone
+from typing import Optional
 import enum
 
+def utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """ts as an aware UTC datetime: SQLite hands back naive ones, and everything stored is UTC."""
+    if ts is None: return None
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
 class RoleEnum(str, enum.Enum):
     citizen = "citizen"
     department = "department"
@@ -61,22 +68,36 @@ class Report(Base):
     issue_type     = Column(Enum(IssueTypeEnum), nullable=False)
     latitude       = Column(Float, nullable=False)
     longitude      = Column(Float, nullable=False)
+    grid_cell      = Column(BigInteger, nullable=True, index=True)   # geo.cell_id(latitude, longitude)
     address        = Column(String(500), nullable=True)
+    ward           = Column(String(100), nullable=True)   # the reporter's ward when filed; report_counters key on it
     status         = Column(Enum(StatusEnum), default=StatusEnum.submitted)
     priority       = Column(Enum(PriorityEnum), default=PriorityEnum.low)
     priority_score = Column(Float, default=0.0)
     upvote_count   = Column(Integer, default=0)
     is_duplicate   = Column(Boolean, default=False)
+    canonical_id   = Column(Integer, ForeignKey("reports.id"), nullable=True)   # original report when is_duplicate
     is_hotspot     = Column(Boolean, default=False)
     sla_deadline   = Column(DateTime(timezone=True), nullable=True)
-    created_at     = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at     = Column(DateTime(timezone=True), onupdate=func.now())
+    sla_breached_at = Column(DateTime(timezone=True), nullable=True)   # set once by sla.SlaMonitor; never re-delayed after
+    # client-side default keeps the stored value identical to the keyset cursor that echoes it back
+    created_at     = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    updated_at     = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
     user_id        = Column(Integer, ForeignKey("users.id"))
     department_id  = Column(Integer, ForeignKey("departments.id"), nullable=True)
     user           = relationship("User", back_populates="reports")
     department     = relationship("Department", back_populates="reports")
     votes          = relationship("Vote", back_populates="report")
     status_history = relationship("StatusHistory", back_populates="report")
+    # Seek indexes for keyset pagination of GET /api/reports/ (one per supported filter combination)
+    __table_args__ = (
+        Index("ix_reports_created_id",              created_at, id),
+        Index("ix_reports_issue_type_created_id",   issue_type, created_at, id),
+        Index("ix_reports_status_created_id",       status, created_at, id),
+        Index("ix_reports_issue_status_created_id", issue_type, status, created_at, id),
+        # next unbreached SLA deadlines per status, read by sla.SlaMonitor
+        Index("ix_reports_sla_due",                 status, sla_breached_at, sla_deadline),
+    )
 
 class Vote(Base):
     __tablename__ = "votes"
@@ -86,14 +107,55 @@ class Vote(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     user       = relationship("User", back_populates="votes")
     report     = relationship("Report", back_populates="votes")
+    # one vote per user per report; also the index behind the "already voted" conflict check.
+    # It leads with user_id, so per-report counts (vote reconciliation) get their own index.
+    __table_args__ = (
+        UniqueConstraint("user_id", "report_id", name="uq_votes_user_report"),
+        Index("ix_votes_report_id", "report_id"),
+    )
 
 class StatusHistory(Base):
     __tablename__ = "status_history"
     id         = Column(Integer, primary_key=True, index=True)
-    report_id  = Column(Integer, ForeignKey("reports.id"))
+    report_id  = Column(Integer, ForeignKey("reports.id"), index=True)
     old_status = Column(Enum(StatusEnum), nullable=True)
     new_status = Column(Enum(StatusEnum), nullable=False)
     remark     = Column(Text, nullable=True)
     changed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     timestamp  = Column(DateTime(timezone=True), server_default=func.now())
-    report     = relationship("Report", back_populates="status_history")
\ No newline at end of file
+    report     = relationship("Report", back_populates="status_history")
+    # fetch the server-side timestamp in the INSERT's RETURNING clause instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+class ReportCluster(Base):
+    # per-cell marker aggregates for each geo.CLUSTER_LEVELS grid, maintained by clusters.py
+    __tablename__ = "report_clusters"
+    level      = Column(Integer, primary_key=True)
+    cell       = Column(BigInteger, primary_key=True)
+    issue_type = Column(Enum(IssueTypeEnum), primary_key=True)
+    status     = Column(Enum(StatusEnum), primary_key=True)
+    count      = Column(Integer, nullable=False, default=0)
+    sum_lat    = Column(Float, nullable=False, default=0.0)
+    sum_lon    = Column(Float, nullable=False, default=0.0)
+
+class ReportCounter(Base):
+    # report counts per status for the whole city, each user, department and ward, maintained by counters.py
+    __tablename__ = "report_counters"
+    scope     = Column(String(16), primary_key=True)    # "all" | "user" | "department" | "ward"
+    scope_key = Column(String(100), primary_key=True)   # user/department id or ward name; "" for "all"
+    status    = Column(Enum(StatusEnum), primary_key=True)
+    count     = Column(Integer, nullable=False, default=0)
+
+class CacheVersion(Base):
+    # bumped by writers of cached tables so every worker's in-process cache can notice (cache.py)
+    __tablename__ = "cache_versions"
+    name    = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class CacheInvalidation(Base):
+    # append-only log of response-cache tags dropped by writers; each worker replays new rows (cache.py)
+    __tablename__ = "cache_invalidations"
+    id         = Column(Integer, primary_key=True, index=True)
+    tag        = Column(String(100), nullable=False)
+    origin     = Column(String(32), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
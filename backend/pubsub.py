@@ -0,0 +1,166 @@
+import asyncio, os
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import geo
+
+# In-process fan-out of report deltas to /api/live subscribers. Writers queue events on their
+# session and they are published after the commit; each worker only sees its own writes.
+LIVE_QUEUE_SIZE        = int(os.getenv("LIVE_QUEUE_SIZE", "64"))          # pending messages per connection
+LIVE_MAX_SUBSCRIPTIONS = int(os.getenv("LIVE_MAX_SUBSCRIPTIONS", "200"))  # report + department ids per connection
+INDEX_CELL_DEG    = 1.0   # bbox subscriptions are indexed on a coarse grid...
+MAX_INDEXED_CELLS = 64    # ...unless they span more cells than this, then they are scanned
+
+RESYNC = orjson.dumps({"type": "resync"})
+
+class Subscriber:
+    """One live connection: its subscriptions and a bounded queue of encoded messages."""
+
+    def __init__(self, queue_size: int = LIVE_QUEUE_SIZE):
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(queue_size)
+        self.reports: Set[int] = set()
+        self.departments: Set[int] = set()
+        self.bbox: Optional[geo.BBox] = None
+        self.cells: Set[int] = set()
+
+    def offer(self, message: bytes) -> bool:
+        """Queue message; False if the queue was full and has been replaced by a resync."""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            # slow reader: drop its backlog and tell it to re-fetch rather than grow without bound
+            while not self.queue.empty(): self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return False
+
+class Hub:
+    """Subscription indexes by report id, department id and coarse map cell.
+
+    All state is touched on the event loop only: publish() may be called from any thread and
+    hops onto the loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers: Set[Subscriber] = set()
+        self._by_report: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._by_dept: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._by_cell: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._wide: Set[Subscriber] = set()
+        self.published = self.delivered = self.overflows = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def connect(self) -> Subscriber:
+        sub = Subscriber()
+        self.subscribers.add(sub)
+        return sub
+
+    def disconnect(self, sub: Subscriber):
+        self.unsubscribe(sub, sub.reports, sub.departments, bbox=True)
+        self.subscribers.discard(sub)
+
+    def subscribe(self, sub: Subscriber, reports: Iterable[int] = (), departments: Iterable[int] = (), bbox: Optional[geo.BBox] = None):
+        """Add report/department subscriptions; a bbox replaces the previous one."""
+        for rid in reports:
+            if len(sub.reports) + len(sub.departments) >= LIVE_MAX_SUBSCRIPTIONS: raise ValueError("too many subscriptions")
+            sub.reports.add(rid); self._by_report[rid].add(sub)
+        for did in departments:
+            if len(sub.reports) + len(sub.departments) >= LIVE_MAX_SUBSCRIPTIONS: raise ValueError("too many subscriptions")
+            sub.departments.add(did); self._by_dept[did].add(sub)
+        if bbox is not None:
+            self.unsubscribe(sub, bbox=True)
+            sub.bbox = bbox
+            ranges = geo.cell_ranges(bbox, INDEX_CELL_DEG, max_rows=MAX_INDEXED_CELLS)
+            if ranges is None or sum(hi - lo + 1 for lo, hi in ranges) > MAX_INDEXED_CELLS:
+                self._wide.add(sub)
+            else:
+                sub.cells = {c for lo, hi in ranges for c in range(lo, hi + 1)}
+                for c in sub.cells: self._by_cell[c].add(sub)
+
+    def unsubscribe(self, sub: Subscriber, reports: Iterable[int] = (), departments: Iterable[int] = (), bbox: bool = False):
+        for rid in list(reports):
+            sub.reports.discard(rid); _discard(self._by_report, rid, sub)
+        for did in list(departments):
+            sub.departments.discard(did); _discard(self._by_dept, did, sub)
+        if bbox:
+            for c in sub.cells: _discard(self._by_cell, c, sub)
+            self._wide.discard(sub)
+            sub.bbox, sub.cells = None, set()
+
+    def publish(self, event: dict):
+        if self._loop is None or self._loop.is_closed(): return
+        self._loop.call_soon_threadsafe(self._fanout, event)
+
+    def _fanout(self, event: dict):
+        targets = set(self._by_report.get(event["id"], ()))
+        if event.get("department_id") is not None:
+            targets |= self._by_dept.get(event["department_id"], set())
+        lat, lon = event.get("latitude"), event.get("longitude")
+        if lat is not None and lon is not None:
+            for sub in self._by_cell.get(geo.cell_id(lat, lon, INDEX_CELL_DEG), ()):
+                if _inside(sub.bbox, lat, lon): targets.add(sub)
+            for sub in self._wide:
+                if _inside(sub.bbox, lat, lon): targets.add(sub)
+        self.published += 1
+        if not targets: return
+        message = orjson.dumps(event)
+        for sub in targets:
+            if not sub.offer(message): self.overflows += 1
+        self.delivered += len(targets)
+
+    def publish_on_commit(self, db: Session, event: dict):
+        """Queue event on the session; it is published once the transaction commits."""
+        db.info.setdefault("live_events", []).append(event)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.subscribers), "published": self.published, "delivered": self.delivered,
+            "report_subscriptions": sum(len(s) for s in self._by_report.values()),
+            "department_subscriptions": sum(len(s) for s in self._by_dept.values()),
+            "bbox_subscriptions": sum(1 for s in self.subscribers if s.bbox is not None),
+            "overflows": self.overflows,
+        }
+
+def _discard(index: dict, key, sub: Subscriber):
+    subs = index.get(key)
+    if subs is not None:
+        subs.discard(sub)
+        if not subs: del index[key]
+
+def _inside(bbox: Optional[geo.BBox], lat: float, lon: float) -> bool:
+    if bbox is None: return False
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+def report_delta(report_id: int, status, upvote_count: int, priority, department_id: Optional[int], latitude: float, longitude: float) -> dict:
+    """Compact change of a report's live fields; location and department route it to subscribers."""
+    return {
+        "type": "report", "id": report_id, "status": getattr(status, "value", status), "upvote_count": upvote_count,
+        "priority": getattr(priority, "value", priority), "department_id": department_id, "latitude": latitude, "longitude": longitude,
+    }
+
+def report_created(report) -> dict:
+    """A delta plus the few fields a map marker or list row needs to show a new report."""
+    return dict(
+        report_delta(report.id, report.status, report.upvote_count or 0, report.priority, report.department_id, report.latitude, report.longitude),
+        type="created", title=report.title, issue_type=getattr(report.issue_type, "value", report.issue_type), created_at=report.created_at,
+    )
+
+def report_changed(report) -> dict:
+    return report_delta(report.id, report.status, report.upvote_count or 0, report.priority, report.department_id, report.latitude, report.longitude)
+
+hub = Hub()
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    for live_event in session.info.pop("live_events", ()):
+        hub.publish(live_event)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("live_events", None)
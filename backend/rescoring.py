@@ -0,0 +1,43 @@
+import logging, os, time
+from datetime import datetime, timezone
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+import models, services
+from cache import response_cache
+
+# priority_score decays with age, so it goes stale between votes and status changes.
+# A row is rewritten when its label changes or its score has drifted by at least
+# PRIORITY_RESCORE_MIN_DELTA (dept_reports orders by the score itself).
+PRIORITY_RESCORE_INTERVAL_SECONDS = float(os.getenv("PRIORITY_RESCORE_INTERVAL_SECONDS", "900"))
+PRIORITY_RESCORE_MIN_DELTA        = float(os.getenv("PRIORITY_RESCORE_MIN_DELTA", "1.0"))
+RESCORE_BATCH = 5000
+
+logger = logging.getLogger(__name__)
+
+def rescore_open_reports(db: Session):
+    """Recompute priority for every open report, keyset-batched by id, with one executemany UPDATE per batch."""
+    t0, now = time.perf_counter(), datetime.now(timezone.utc)
+    last_id, scanned, written = 0, 0, 0
+    while True:
+        rows = db.query(
+            models.Report.id, models.Report.upvote_count, models.Report.created_at,
+            models.Report.priority_score, models.Report.priority,
+        ).filter(models.Report.status.in_(services.OPEN_STATUSES), models.Report.id > last_id).order_by(models.Report.id).limit(RESCORE_BATCH).all()
+        if not rows: break
+        last_id = rows[-1].id
+        scanned += len(rows)
+        scores = [services.compute_priority_score(r.upvote_count or 0, r.created_at, now) for r in rows]
+        labels = [services.score_to_label(score) for score in scores]
+        changes = [
+            {"id": r.id, "priority_score": score, "priority": label}
+            for r, score, label in zip(rows, scores, labels)
+            if label != getattr(r.priority, "value", r.priority) or abs(score - (r.priority_score or 0.0)) >= PRIORITY_RESCORE_MIN_DELTA
+        ]
+        if changes:
+            db.execute(update(models.Report), changes)
+            response_cache.invalidate(db, {"reports"})
+            db.commit()
+            written += len(changes)
+    elapsed = time.perf_counter() - t0
+    logger.info("Priority re-scoring: %d open reports scanned, %d updated in %.2fs (%.0f rows/s)",
+                scanned, written, elapsed, scanned / elapsed if elapsed else 0.0)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from auth import principal_cache, require_role, token_cache
+from cache import department_cache, response_cache
+import database, hashing, models, pubsub, sla
+
+router = APIRouter(dependencies=[Depends(require_role(models.RoleEnum.admin))])
+
+@router.get("/hashing-stats")
+def hashing_stats():
+    return hashing.pool.stats()
+
+@router.get("/pool-stats")
+def pool_stats():
+    return {name: stats.snapshot() for name, stats in database.pool_stats.items()}
+
+@router.get("/cache-stats")
+def cache_stats():
+    return {"departments": department_cache.stats(), "principals": principal_cache.stats(), "tokens": token_cache.stats(), "responses": response_cache.stats()}
+
+@router.get("/live-stats")
+def live_stats():
+    return pubsub.hub.stats()
+
+@router.get("/sla-stats")
+def sla_stats():
+    return sla.monitor.stats()
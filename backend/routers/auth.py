@@ -1,33 +1,49 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, run_db
 from services import seed_departments
-import models, schemas, auth as auth_utils
+import hashing, models, schemas, auth as auth_utils
 
 router = APIRouter()
 
-@router.post("/signup", response_model=schemas.TokenResponse, status_code=201)
-def signup(payload: schemas.UserCreate, db: Session = Depends(get_db)):
+def _create_user(db: Session, payload: schemas.UserCreate, hashed_password: str) -> models.User:
     seed_departments(db)
     if db.query(models.User).filter(models.User.email == payload.email).first():
         raise HTTPException(status_code=400, detail="Email already registered")
     user = models.User(
-        name=payload.name, email=payload.email,
-        hashed_password=auth_utils.hash_password(payload.password),
+        name=payload.name, email=payload.email, hashed_password=hashed_password,
         ward=payload.ward, role=models.RoleEnum.citizen,
     )
     db.add(user); db.commit(); db.refresh(user)
+    return user
+
+def _user_by_email(db: Session, email: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+# bcrypt is awaited on the hashing pool; the DB work goes through run_db
+@router.post("/signup", response_model=schemas.TokenResponse, status_code=201)
+async def signup(payload: schemas.UserCreate, db: Session = Depends(get_db)):
+    # a taken email is refused before spending a hashing slot on it; _create_user checks again
+    if await run_db(db, _user_by_email, payload.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    hashed_password = await hashing.pool.hash(payload.password)
+    user = await run_db(db, _create_user, payload, hashed_password)
     token = auth_utils.create_access_token({"sub": str(user.id), "role": user.role})
     return {"access_token": token, "user": user}
 
 @router.post("/login", response_model=schemas.TokenResponse)
-def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == payload.email).first()
-    if not user or not auth_utils.verify_password(payload.password, user.hashed_password):
+async def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
+    user = await run_db(db, _user_by_email, payload.email)
+    if not user or not await hashing.pool.verify(payload.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     token = auth_utils.create_access_token({"sub": str(user.id), "role": user.role})
     return {"access_token": token, "user": user}
 
 @router.get("/me", response_model=schemas.UserOut)
-def me(current_user: models.User = Depends(auth_utils.get_current_user)):
-    return current_user
\ No newline at end of file
+async def me(current_user: auth_utils.Principal = Depends(auth_utils.get_current_user), db: Session = Depends(get_db)):
+    # the cached principal carries no profile fields, and may outlive a deleted user
+    user = await run_db(db, Session.get, models.User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
\ No newline at end of file
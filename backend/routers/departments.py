@@ -1,15 +1,43 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-import models, schemas
+from typing import List, Optional
+from database import get_read_db, run_db
+from auth import Principal, get_optional_user
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from cache import department_cache, response_cache
+import conditional, models, schemas, services
 
 router = APIRouter()
+DEPARTMENT_LIST_ADAPTER = TypeAdapter(List[schemas.DepartmentOut])
 
 @router.get("/", response_model=List[schemas.DepartmentOut])
-def list_departments(db: Session = Depends(get_db)):
-    return db.query(models.Department).all()
+async def list_departments(request: Request, db: Session = Depends(get_read_db)):
+    cached = response_cache.lookup(request, "departments.list")
+    if cached: return cached
+    depts = await run_db(db, department_cache.all)
+    body = Response(DEPARTMENT_LIST_ADAPTER.dump_json(DEPARTMENT_LIST_ADAPTER.validate_python(depts, from_attributes=True)), media_type="application/json")
+    response_cache.store(request, body, {"departments"})
+    return body
 
-@router.get("/{dept_id}/reports", response_model=List[schemas.ReportOut])
-def dept_reports(dept_id: int, db: Session = Depends(get_db)):
-    return db.query(models.Report).filter(models.Report.department_id == dept_id).order_by(models.Report.priority_score.desc()).all()
\ No newline at end of file
+def _dept_reports(db: Session, request: Request, dept_id: int, projection, user: Optional[Principal]):
+    q = services.report_list_query(db, projection).filter(models.Report.department_id == dept_id).order_by(models.Report.priority_score.desc())
+    user_id = user.id if user else None
+    headers = conditional.validators(conditional.page_version(db, q, request, user_id), private=user is not None)
+    if conditional.is_fresh(request, headers["ETag"]): return conditional.not_modified(headers)
+    reports = q.all()
+    body = services.render_reports(db, reports, projection, user)
+    body.headers.update(headers)
+    response_cache.store(request, body, {"reports", f"dept:{dept_id}"} | {f"report:{r.id}" for r in reports})
+    return body
+
+@router.get("/{dept_id}/reports", response_model=schemas.ReportListOut)
+async def dept_reports(
+    request: Request, dept_id: int,
+    view: str = Query("full", pattern="^(full|summary)$"), fields: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db), current_user: Optional[Principal] = Depends(get_optional_user),
+):
+    projection = services.resolve_projection(view, fields)
+    cached = response_cache.lookup(request, "departments.reports")
+    if cached: return cached
+    return await run_db(db, _dept_reports, request, dept_id, projection, current_user)
@@ -0,0 +1,60 @@
+import asyncio, logging
+from typing import List, Optional
+import orjson
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+import geo, pubsub
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Live report deltas. Subscriptions come from the query string and can be changed with
+#   {"action": "subscribe" | "unsubscribe", "reports": [ids], "departments": [ids], "bbox": "minLon,minLat,maxLon,maxLat"}
+# Messages are {"type": "report" | "created", id, status, upvote_count, priority, ...}, or
+# {"type": "resync"} when the client fell behind and should re-fetch what it shows.
+
+def _ids(raw) -> List[int]:
+    if raw is None: return []
+    if isinstance(raw, str): raw = [p for p in raw.split(",") if p.strip()]
+    return [int(i) for i in raw]
+
+def _apply(sub: pubsub.Subscriber, message: dict):
+    reports, departments = _ids(message.get("reports")), _ids(message.get("departments"))
+    if message.get("action") == "unsubscribe":
+        pubsub.hub.unsubscribe(sub, reports, departments, bbox=bool(message.get("bbox")))
+        return
+    bbox = geo.parse_bbox(message["bbox"]) if message.get("bbox") else None
+    pubsub.hub.subscribe(sub, reports, departments, bbox)
+
+async def _writer(websocket: WebSocket, sub: pubsub.Subscriber):
+    try:
+        while True:
+            await websocket.send_text((await sub.queue.get()).decode())
+    except Exception:
+        # the socket is gone or broken; the receive loop sees the disconnect and cleans up
+        logger.warning("Live connection writer stopped", exc_info=True)
+
+@router.websocket("")
+async def live(
+    websocket: WebSocket,
+    reports: Optional[str] = Query(None), departments: Optional[str] = Query(None),
+    bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat"),
+):
+    await websocket.accept()
+    sub = pubsub.hub.connect()
+    # one writer per connection drains its bounded queue; publishers never await a socket
+    writer = asyncio.create_task(_writer(websocket, sub))
+    try:
+        try:
+            _apply(sub, {"reports": reports, "departments": departments, "bbox": bbox})
+        except ValueError as e:
+            await websocket.close(code=1008, reason=str(e)); return
+        while True:
+            try:
+                _apply(sub, orjson.loads(await websocket.receive_text()))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                sub.offer(orjson.dumps({"type": "error", "detail": str(e)}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        writer.cancel()
+        pubsub.hub.disconnect(sub)
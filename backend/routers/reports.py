@@ -1,53 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from database import get_db
-from auth import get_current_user
-import models, schemas, services
+from database import get_db, get_read_db, run_db
+from auth import Principal, get_current_user, get_optional_user
+from cache import entering_list_tags, list_tag, response_cache
+import clusters, conditional, counters, duplicates, geo, models, pubsub, schemas, services
 
 router = APIRouter()
 
-@router.post("/", response_model=schemas.ReportOut, status_code=201)
-def create_report(payload: schemas.ReportCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+# Route bodies are sync functions of the session, run through database.run_db: on the async
+# stack they await the driver via AsyncSession.run_sync, otherwise they run on the threadpool.
+
+def _create_report(db: Session, payload: schemas.ReportCreate, user: Principal) -> schemas.ReportOut:
+    # one transaction, one commit: department comes from the routing cache, ids and defaults
+    # come back through INSERT ... RETURNING, and the response is built before the commit
+    # expires the objects (so there is no refresh round trip)
     dept = services.assign_department(payload.issue_type, db)
+    canonical_id = duplicates.index.find(payload.issue_type, payload.latitude, payload.longitude)
+    status = models.StatusEnum.assigned if dept else models.StatusEnum.submitted
     report = models.Report(
-        **payload.model_dump(), user_id=current_user.id,
-        department_id=dept.id if dept else None,
-        status=models.StatusEnum.assigned if dept else models.StatusEnum.submitted,
+        **payload.model_dump(), user_id=user.id, ward=user.ward,
+        department=dept, status=status,
         sla_deadline=services.get_sla_deadline(payload.issue_type),
+        grid_cell=geo.cell_id(payload.latitude, payload.longitude),
+        is_duplicate=canonical_id is not None, canonical_id=canonical_id,
+        status_history=[models.StatusHistory(old_status=None, new_status=status, remark="Auto-assigned", changed_by=user.id)],
     )
-    db.add(report); db.commit(); db.refresh(report)
-    db.add(models.StatusHistory(report_id=report.id, old_status=None, new_status=report.status, remark="Auto-assigned", changed_by=current_user.id))
-    db.commit(); db.refresh(report)
-    return report
+    db.add(report); db.flush()
+    clusters.record_created(db, report)
+    counters.record_created(db, report)
+    response_cache.invalidate(db, entering_list_tags(report.issue_type, status) | ({f"dept:{dept.id}"} if dept else set()))
+    pubsub.hub.publish_on_commit(db, pubsub.report_created(report))
+    out = schemas.ReportOut.model_validate(report)
+    db.commit()
+    duplicates.index.sync(out)
+    return out
 
-@router.get("/", response_model=List[schemas.ReportOut])
-def list_reports(issue_type: Optional[str] = Query(None), status: Optional[str] = Query(None), skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    q = db.query(models.Report)
-    if issue_type: q = q.filter(models.Report.issue_type == issue_type)
-    if status:     q = q.filter(models.Report.status == status)
-    return q.order_by(models.Report.created_at.desc()).offset(skip).limit(limit).all()
+@router.post("/", response_model=schemas.ReportOut, status_code=201)
+async def create_report(payload: schemas.ReportCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    return await run_db(db, _create_report, payload, current_user)
 
-@router.get("/my", response_model=List[schemas.ReportOut])
-def my_reports(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Report).filter(models.Report.user_id == current_user.id).order_by(models.Report.created_at.desc()).all()
+def _list_reports(db: Session, request: Request, filters: dict, cursor, skip: int, limit: int, projection, user):
+    q = services.report_list_query(db, projection)
+    if filters["issue_type"]: q = q.filter(models.Report.issue_type == filters["issue_type"])
+    if filters["status"]:     q = q.filter(models.Report.status == filters["status"])
+    if filters["bbox"]:       q = services.filter_bbox(q, filters["bbox"])
+    if cursor:
+        position = services.decode_cursor(cursor)
+        if not position: raise HTTPException(status_code=400, detail="Invalid cursor")
+        q = q.filter(tuple_(models.Report.created_at, models.Report.id) < position)
+    # order before offset/limit: Query refuses order_by() once either is applied
+    q = q.order_by(models.Report.created_at.desc(), models.Report.id.desc())
+    if not cursor and skip: q = q.offset(skip)
+    # fetch one extra row to learn whether another page exists
+    q = q.limit(limit + 1)
+    user_id = user.id if user else None
+    headers = conditional.validators(conditional.page_version(db, q, request, user_id), private=user is not None)
+    if conditional.is_fresh(request, headers["ETag"]): return conditional.not_modified(headers)
+    reports = q.all()
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        next_cursor = services.encode_cursor(reports[-1].created_at, reports[-1].id)
+    body = services.render_reports(db, reports, projection, user)
+    body.headers.update(headers)
+    if next_cursor: body.headers["X-Next-Cursor"] = next_cursor
+    response_cache.store(request, body, {"reports", list_tag(filters["issue_type"], filters["status"])} | {f"report:{r.id}" for r in reports})
+    return body
 
-@router.get("/{report_id}", response_model=schemas.ReportOut)
-def get_report(report_id: int, db: Session = Depends(get_db)):
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
+@router.get("/", response_model=schemas.ReportListOut)
+async def list_reports(
+    request: Request,
+    issue_type: Optional[str] = Query(None), status: Optional[str] = Query(None),
+    bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat"),
+    cursor: Optional[str] = Query(None, description="Opaque X-Next-Cursor value from the previous page"),
+    skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=services.MAX_PAGE_SIZE),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated report columns; overrides view"),
+    db: Session = Depends(get_read_db), current_user: Optional[Principal] = Depends(get_optional_user),
+):
+    projection = services.resolve_projection(view, fields)
+    filters = {"issue_type": issue_type, "status": status, "bbox": bbox}
+    cached = response_cache.lookup(request, "reports.list")
+    if cached: return cached
+    return await run_db(db, _list_reports, request, filters, cursor, skip, limit, projection, current_user)
+
+def _my_reports(db: Session, request: Request, projection, user: Principal):
+    q = services.report_list_query(db, projection).filter(models.Report.user_id == user.id).order_by(models.Report.created_at.desc())
+    headers = conditional.validators(conditional.page_version(db, q, request, user.id), private=True)
+    if conditional.is_fresh(request, headers["ETag"]): return conditional.not_modified(headers)
+    body = services.render_reports(db, q.all(), projection, user)
+    body.headers.update(headers)
+    return body
+
+@router.get("/my", response_model=schemas.ReportListOut)
+async def my_reports(
+    request: Request,
+    view: str = Query("full", pattern="^(full|summary)$"), fields: Optional[str] = Query(None),
+    db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user),
+):
+    projection = services.resolve_projection(view, fields)
+    return await run_db(db, _my_reports, request, projection, current_user)
+
+@router.get("/clusters", response_model=List[schemas.ClusterOut])
+async def report_clusters(bbox: str = Query(..., description="minLon,minLat,maxLon,maxLat"), zoom: int = Query(..., ge=0, le=22), db: Session = Depends(get_read_db)):
+    try:
+        box = geo.parse_bbox(bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {e}")
+    return await run_db(db, clusters.query, box, zoom)
+
+def _get_report(db: Session, request: Request, report_id: int, user: Optional[Principal]):
+    version = conditional.report_version(db, report_id, user.id if user else None)
+    if not version: raise HTTPException(status_code=404, detail="Report not found")
+    headers = conditional.validators(*version, private=user is not None)
+    if conditional.is_fresh(request, *version): return conditional.not_modified(headers)
+    report = services.report_query(db).filter(models.Report.id == report_id).first()
     if not report: raise HTTPException(status_code=404, detail="Report not found")
-    return report
+    body = services.render_reports(db, [report], None, user, single=True)
+    body.headers.update(headers)
+    response_cache.store(request, body, {"reports", f"report:{report_id}"})
+    return body
 
-@router.patch("/{report_id}/status", response_model=schemas.ReportOut)
-def update_status(report_id: int, payload: schemas.ReportUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@router.get("/{report_id}", response_model=schemas.ReportOut)
+async def get_report(request: Request, report_id: int, db: Session = Depends(get_read_db), current_user: Optional[Principal] = Depends(get_optional_user)):
+    cached = response_cache.lookup(request, "reports.detail")
+    if cached: return cached
+    return await run_db(db, _get_report, request, report_id, current_user)
+
+def _update_status(db: Session, report_id: int, payload: schemas.ReportUpdate, user: Principal) -> schemas.ReportOut:
     report = db.query(models.Report).filter(models.Report.id == report_id).first()
     if not report: raise HTTPException(status_code=404, detail="Not found")
-    if current_user.role not in [models.RoleEnum.department, models.RoleEnum.admin]:
-        raise HTTPException(status_code=403, detail="Not authorized")
     old = report.status
     if payload.status: report.status = payload.status
+    clusters.record_status_change(db, report, old, report.status)
+    counters.record_status_change(db, report, old, report.status)
     report.priority_score = services.compute_priority_score(report.upvote_count, report.created_at)
     report.priority = services.score_to_label(report.priority_score)
-    db.add(models.StatusHistory(report_id=report.id, old_status=old, new_status=report.status, remark=payload.remark, changed_by=current_user.id))
+    db.add(models.StatusHistory(report_id=report.id, old_status=old, new_status=report.status, remark=payload.remark, changed_by=user.id))
+    # both sides move: lists of the new status gain the report, every page of the old status' lists shifts
+    response_cache.invalidate(db, {f"report:{report.id}"} | entering_list_tags(report.issue_type, report.status) | entering_list_tags(report.issue_type, old))
+    pubsub.hub.publish_on_commit(db, pubsub.report_changed(report))
     db.commit(); db.refresh(report)
-    return report
\ No newline at end of file
+    duplicates.index.sync(report)
+    # serialise while the session can still load department and history
+    return schemas.ReportOut.model_validate(report)
+
+@router.patch("/{report_id}/status", response_model=schemas.ReportOut)
+async def update_status(report_id: int, payload: schemas.ReportUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    if current_user.role not in [models.RoleEnum.department, models.RoleEnum.admin]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return await run_db(db, _update_status, report_id, payload, current_user)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Dict
+from database import get_read_db, run_db
+from auth import Principal, get_current_user, require_role
+import counters, models, schemas
+
+router = APIRouter()
+
+# Dashboard counts read from report_counters (kept current by the report writers), so each
+# endpoint is one small indexed read however many reports there are.
+staff = require_role(models.RoleEnum.department, models.RoleEnum.admin)
+
+@router.get("/", response_model=schemas.StatsOut)
+async def overall(db: Session = Depends(get_read_db)):
+    return (await run_db(db, counters.query, "all", ""))[""]
+
+@router.get("/me", response_model=schemas.StatsOut)
+async def my_stats(db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
+    key = str(current_user.id)
+    return (await run_db(db, counters.query, "user", key))[key]
+
+@router.get("/departments", dependencies=[Depends(staff)], response_model=Dict[int, schemas.StatsOut])
+async def by_department(db: Session = Depends(get_read_db)):
+    return await run_db(db, counters.query, "department")
+
+@router.get("/departments/{dept_id}", dependencies=[Depends(staff)], response_model=schemas.StatsOut)
+async def department_stats(dept_id: int, db: Session = Depends(get_read_db)):
+    return (await run_db(db, counters.query, "department", str(dept_id)))[str(dept_id)]
+
+@router.get("/wards", dependencies=[Depends(staff)], response_model=Dict[str, schemas.StatsOut])
+async def by_ward(db: Session = Depends(get_read_db)):
+    return await run_db(db, counters.query, "ward")
+
+@router.get("/wards/{ward}", dependencies=[Depends(staff)], response_model=schemas.StatsOut)
+async def ward_stats(ward: str, db: Session = Depends(get_read_db)):
+    return (await run_db(db, counters.query, "ward", ward))[ward]
@@ -1,43 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
-import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from database import get_db
-from auth import get_current_user
-import models, schemas, services
+from typing import List
+from database import get_db, dialect_insert, run_db
+from auth import Principal, get_current_user
+from cache import response_cache
+import models, pubsub, schemas, services, vote_buffer
 
 router = APIRouter()
-logger = logging.getLogger(__name__)
 
-@router.post("/{report_id}", response_model=schemas.VoteOut, status_code=201)
-def vote(report_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
-    if not report: raise HTTPException(status_code=404, detail="Not found")
-    if db.query(models.Vote).filter(models.Vote.user_id == current_user.id, models.Vote.report_id == report_id).first():
-        raise HTTPException(status_code=400, detail="Already voted")
+def _bump(db: Session, report_id: int, delta: int):
+    # server-side increment; the row lock it takes orders concurrent voters on this report
+    stmt = update(models.Report).where(models.Report.id == report_id)
+    if delta < 0: stmt = stmt.where(models.Report.upvote_count > 0)
+    return db.execute(
+        stmt.values(upvote_count=models.Report.upvote_count + delta)
+        .returning(models.Report.upvote_count, models.Report.created_at, models.Report.status,
+                   models.Report.department_id, models.Report.latitude, models.Report.longitude)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+def _changed(db: Session, report_id: int, report):
+    priority = services.apply_priority(db, report_id, report.upvote_count, report.created_at)
+    response_cache.invalidate(db, {f"report:{report_id}"})
+    pubsub.hub.publish_on_commit(db, pubsub.report_delta(
+        report_id, report.status, report.upvote_count, priority, report.department_id, report.latitude, report.longitude,
+    ))
+
+@router.get("/mine", response_model=List[int])
+async def my_votes(report_ids: str = Query(..., description="Comma-separated report ids"), db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    """Which of the given reports the caller has voted on."""
     try:
-        vote = models.Vote(user_id=current_user.id, report_id=report_id)
-        db.add(vote)
-        # increment upvote_count and recalculate priority
-        report.upvote_count = (report.upvote_count or 0) + 1
-        report.priority_score = services.compute_priority_score(report.upvote_count, report.created_at)
-        report.priority = services.score_to_label(report.priority_score)
-        db.commit()
-        db.refresh(vote)
-        db.refresh(report)
+        ids = sorted({int(i) for i in report_ids.split(",") if i.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="report_ids must be comma-separated integers")
+    if len(ids) > services.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {services.MAX_PAGE_SIZE} report ids per request")
+    return sorted(await run_db(db, services.voted_report_ids, current_user.id, ids))
+
+def _vote(db: Session, report_id: int, user: Principal):
+    table = models.Vote.__table__
+    try:
+        vote = db.execute(
+            dialect_insert(db, table).values(user_id=user.id, report_id=report_id)
+            .on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.report_id])
+            .returning(table.c.id, table.c.user_id, table.c.report_id, table.c.created_at)
+        ).first()
+    except IntegrityError:
+        # foreign key: the report does not exist
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Not found")
+    if not vote:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Already voted")
+    if vote_buffer.VOTE_WRITE_BEHIND:
+        # counter and priority land with the next batched flush
+        db.commit(); vote_buffer.buffer.add(report_id, 1)
         return vote
-    except Exception as e:
+    report = _bump(db, report_id, 1)
+    if not report:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Not found")
+    _changed(db, report_id, report)
+    db.commit()
+    return vote
+
+@router.post("/{report_id}", response_model=schemas.VoteOut, status_code=201)
+async def vote(report_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    return await run_db(db, _vote, report_id, current_user)
+
+def _unvote(db: Session, report_id: int, user: Principal):
+    removed = db.execute(
+        delete(models.Vote).where(models.Vote.user_id == user.id, models.Vote.report_id == report_id)
+        .returning(models.Vote.id).execution_options(synchronize_session=False)
+    ).first()
+    if not removed:
         db.rollback()
-        logger.exception("Error while casting vote for report %s by user %s", report_id, current_user.id)
-        from fastapi.responses import JSONResponse
-        return JSONResponse(status_code=500, content={"detail": str(e), "type": type(e).__name__})
+        raise HTTPException(status_code=404, detail="Vote not found")
+    if vote_buffer.VOTE_WRITE_BEHIND:
+        db.commit(); vote_buffer.buffer.add(report_id, -1)
+        return
+    report = _bump(db, report_id, -1)
+    if report:
+        _changed(db, report_id, report)
+    db.commit()
 
 @router.delete("/{report_id}", status_code=204)
-def unvote(report_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    vote = db.query(models.Vote).filter(models.Vote.user_id == current_user.id, models.Vote.report_id == report_id).first()
-    if not vote: raise HTTPException(status_code=404, detail="Vote not found")
-    report = db.query(models.Report).filter(models.Report.id == report_id).first()
-    if report and report.upvote_count > 0:
-        report.upvote_count -= 1
-        report.priority_score = services.compute_priority_score(report.upvote_count, report.created_at)
-        report.priority = services.score_to_label(report.priority_score)
-    db.delete(vote); db.commit()
\ No newline at end of file
+async def unvote(report_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    await run_db(db, _unvote, report_id, current_user)
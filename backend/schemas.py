@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Dict, Optional, List, Union
 from datetime import datetime
 from models import RoleEnum, StatusEnum, PriorityEnum, IssueTypeEnum
 
@@ -73,6 +73,7 @@ class ReportOut(BaseModel):
     priority_score: float
     upvote_count: int
     is_duplicate: bool
+    canonical_id: Optional[int] = None
     is_hotspot: bool
     sla_deadline: Optional[datetime]
     created_at: datetime
@@ -80,9 +81,44 @@ class ReportOut(BaseModel):
     department_id: Optional[int]
     department: Optional[DepartmentOut]
     status_history: List[StatusHistoryOut] = []
+    voted_by_me: Optional[bool] = None   # only for signed-in callers
     class Config:
         from_attributes = True
 
+class ReportSummaryOut(BaseModel):
+    """Slim list row for the map and dashboards (?view=summary)."""
+    id: int
+    title: str
+    issue_type: IssueTypeEnum
+    latitude: float
+    longitude: float
+    status: StatusEnum
+    priority: PriorityEnum
+    upvote_count: int
+    is_hotspot: bool
+    created_at: datetime
+    department_id: Optional[int]
+    voted_by_me: Optional[bool] = None
+    class Config:
+        from_attributes = True
+
+# what the report list routes document: full rows, or ?view=summary rows (?fields= returns only
+# the fields asked for, from the scalar ReportOut fields)
+ReportListOut = Union[List[ReportOut], List[ReportSummaryOut]]
+
+class ClusterOut(BaseModel):
+    cell: int
+    count: int
+    latitude: float
+    longitude: float
+    by_issue_type: Dict[str, int]
+    by_status: Dict[str, int]
+
+class StatsOut(BaseModel):
+    total: int
+    pending: int   # neither resolved nor rejected
+    by_status: Dict[str, int]
+
 class VoteOut(BaseModel):
     id: int
     user_id: int
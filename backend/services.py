@@ -1,6 +1,26 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session, selectinload, raiseload
 from datetime import datetime, timedelta, timezone
-import models
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import TypeAdapter
+from typing import List, Optional, Set, Tuple
+import base64, json
+import geo, models, schemas
+from cache import department_cache, response_cache
+
+MAX_PAGE_SIZE = 200
+
+# unresolved reports: candidates for duplicate matching, hotspots and re-scoring
+OPEN_STATUSES = (
+    models.StatusEnum.submitted, models.StatusEnum.assigned, models.StatusEnum.acknowledged,
+    models.StatusEnum.in_progress, models.StatusEnum.delayed,
+)
+
+# ?fields= allowlist: the scalar ReportOut fields, so a new column stays private until ReportOut
+# publishes it; and the preset behind ?view=summary
+REPORT_FIELDS  = tuple(f for f in schemas.ReportOut.model_fields if f in models.Report.__table__.columns.keys())
+SUMMARY_FIELDS = tuple(f for f in schemas.ReportSummaryOut.model_fields if f in REPORT_FIELDS)
 
 SLA_HOURS = {
     "pothole": 72, "garbage": 24, "streetlight": 48, "drainage": 48, "other": 96,
@@ -13,17 +33,113 @@ ISSUE_DEPARTMENT_MAP = {
 
 def assign_department(issue_type: str, db: Session):
     dept_name = ISSUE_DEPARTMENT_MAP.get(issue_type, "General Services")
-    return db.query(models.Department).filter(models.Department.name == dept_name).first()
+    dept = department_cache.by_name(db, dept_name)
+    # attach a session-local copy of the cached row without a SELECT
+    return db.merge(dept, load=False) if dept else None
+
+def report_query(db: Session):
+    # ReportOut touches department and status_history: batch each into one SELECT ... IN per page.
+    # Any other relationship access raises, so a new lazy load on a read path fails instead of going N+1.
+    return db.query(models.Report).options(
+        selectinload(models.Report.department),
+        selectinload(models.Report.status_history),
+        raiseload("*"),
+    )
+
+def resolve_projection(view: str, fields: Optional[str]) -> Optional[List[str]]:
+    # None means the full ReportOut; otherwise the columns to SELECT, id always first
+    if fields:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in names if f not in REPORT_FIELDS]
+        if unknown: raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return ["id"] + [f for f in dict.fromkeys(names) if f != "id"]
+    if view == "summary": return list(SUMMARY_FIELDS)
+    return None
+
+def report_list_query(db: Session, projection: Optional[List[str]] = None):
+    if projection is None:
+        return report_query(db)
+    # plain column SELECT: no ORM hydration, no description text, no history rows.
+    # created_at rides along for keyset cursors even when the client did not ask for it.
+    loaded = projection if "created_at" in projection else projection + ["created_at"]
+    return db.query(*[getattr(models.Report, f) for f in loaded])
+
+def filter_bbox(q, raw: str):
+    try:
+        min_lon, min_lat, max_lon, max_lat = bbox = geo.parse_bbox(raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bbox: {e}")
+    ranges = geo.cell_ranges(bbox)
+    if ranges:
+        # one index range scan on grid_cell per grid row of the viewport
+        q = q.filter(or_(*[models.Report.grid_cell.between(lo, hi) for lo, hi in ranges]))
+    # exact edges: grid cells overhang the box
+    return q.filter(and_(models.Report.latitude.between(min_lat, max_lat), models.Report.longitude.between(min_lon, max_lon)))
+
+def voted_report_ids(db: Session, user_id: int, report_ids: List[int]) -> Set[int]:
+    # one lookup on the (user_id, report_id) unique index for a whole page
+    if not report_ids: return set()
+    return {rid for (rid,) in db.query(models.Vote.report_id).filter(models.Vote.user_id == user_id, models.Vote.report_id.in_(report_ids))}
+
+# built once: FastAPI's response_model path re-validates from attributes, runs jsonable_encoder
+# and json.dumps on every response, which dominates long lists
+REPORT_ADAPTER      = TypeAdapter(schemas.ReportOut)
+REPORT_LIST_ADAPTER = TypeAdapter(List[schemas.ReportOut])
+SUMMARY_ADAPTER      = TypeAdapter(schemas.ReportSummaryOut)
+SUMMARY_LIST_ADAPTER = TypeAdapter(List[schemas.ReportSummaryOut])
+_NESTED          = ("department", "status_history")
+_REPORT_COLUMNS  = [f for f in schemas.ReportOut.model_fields if f not in _NESTED]
+_DEPT_COLUMNS    = list(schemas.DepartmentOut.model_fields)
+_HISTORY_COLUMNS = list(schemas.StatusHistoryOut.model_fields)
+
+def _attrs(obj, fields) -> dict:
+    # loaded ORM state lives in __dict__; reading it there skips the instrumented descriptors,
+    # which is most of what from_attributes validation costs. Anything unloaded goes through getattr.
+    d = obj.__dict__
+    return {f: d[f] if f in d else getattr(obj, f, None) for f in fields}
+
+def _report_row(report) -> dict:
+    row = _attrs(report, _REPORT_COLUMNS)
+    dept, history = _attrs(report, _NESTED).values()
+    row["department"] = _attrs(dept, _DEPT_COLUMNS) if dept is not None else None
+    row["status_history"] = [_attrs(h, _HISTORY_COLUMNS) for h in history]
+    return row
+
+def render_reports(db: Session, reports, projection: Optional[List[str]], user=None, single: bool = False) -> Response:
+    """Serialised response body: ReportOut JSON, or just the projected columns.
+
+    ORM rows are validated as plain dicts by the precompiled ReportOut adapter and dumped straight
+    to JSON bytes, ?view=summary rows likewise by the ReportSummaryOut one; other projections go to orjson. For a signed-in caller (an auth.Principal) each row
+    also carries voted_by_me. single=True renders reports[0] as an object instead of a list.
+    """
+    voted = voted_report_ids(db, user.id, [r.id for r in reports]) if user else None
+    if projection:
+        rows = [{f: getattr(r, f) for f in projection} for r in reports]
+        if voted is not None:
+            for row in rows: row["voted_by_me"] = row["id"] in voted
+        if projection == list(SUMMARY_FIELDS):
+            adapter, data = (SUMMARY_ADAPTER, rows[0]) if single else (SUMMARY_LIST_ADAPTER, rows)
+            return Response(adapter.dump_json(adapter.validate_python(data)), media_type="application/json")
+        return ORJSONResponse(rows[0] if single else rows)
+    rows = [_report_row(r) for r in reports]
+    if voted is not None:
+        for row in rows: row["voted_by_me"] = row["id"] in voted
+    if single:
+        body = REPORT_ADAPTER.dump_json(REPORT_ADAPTER.validate_python(rows[0]))
+    else:
+        body = REPORT_LIST_ADAPTER.dump_json(REPORT_LIST_ADAPTER.validate_python(rows))
+    return Response(body, media_type="application/json")
 
 def get_sla_deadline(issue_type: str) -> datetime:
     return datetime.now(timezone.utc) + timedelta(hours=SLA_HOURS.get(issue_type, 96))
 
-def compute_priority_score(upvotes: int, created_at: datetime) -> float:
+def compute_priority_score(upvotes: int, created_at: datetime, now: Optional[datetime] = None) -> float:
+    # callers scoring a batch pass one `now` so every row decays against the same instant
+    now = now or datetime.now(timezone.utc)
     # created_at may be None in some edge cases; fall back to now to avoid errors
     if not created_at:
-        created_at = datetime.now(timezone.utc)
+        created_at = now
     # ensure both datetimes are timezone-aware (UTC) for subtraction
-    now = datetime.now(timezone.utc)
     if created_at.tzinfo is None:
         created_at = created_at.replace(tzinfo=timezone.utc)
     age_hours = max((now - created_at).total_seconds() / 3600, 0.5)
@@ -34,6 +150,30 @@ def score_to_label(score: float) -> str:
     elif score >= 5: return "medium"
     return "low"
 
+def apply_priority(db: Session, report_id: int, upvotes: int, created_at: datetime):
+    """Write score and label for a report whose new upvote_count came back from a RETURNING clause; returns the label."""
+    score = compute_priority_score(upvotes, created_at)
+    label = score_to_label(score)
+    db.execute(
+        update(models.Report).where(models.Report.id == report_id)
+        .values(priority_score=score, priority=label)
+        .execution_options(synchronize_session=False)
+    )
+    return label
+
+def encode_cursor(created_at: datetime, report_id: int) -> str:
+    # opaque keyset position: the (created_at, id) of the last row on the page
+    raw = json.dumps([created_at.isoformat(), report_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, report_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(report_id)
+    except (ValueError, TypeError):
+        return None
+
 def seed_departments(db: Session):
     defaults = [
         {"name": "Road Maintenance",  "contact_email": "roads@civictrack.gov",     "supported_issue_types": "pothole"},
@@ -42,7 +182,12 @@ def seed_departments(db: Session):
         {"name": "Water & Sewer",     "contact_email": "water@civictrack.gov",     "supported_issue_types": "drainage"},
         {"name": "General Services",  "contact_email": "general@civictrack.gov",   "supported_issue_types": "other"},
     ]
-    for d in defaults:
-        if not db.query(models.Department).filter(models.Department.name == d["name"]).first():
-            db.add(models.Department(**d))
-    db.commit()
\ No newline at end of file
+    existing = {d.name for d in department_cache.all(db)}
+    missing = [d for d in defaults if d["name"] not in existing]
+    if not missing: return
+    for d in missing:
+        db.add(models.Department(**d))
+    department_cache.touch(db)
+    response_cache.invalidate(db, {"departments"})
+    db.commit()
+    department_cache.invalidate()
\ No newline at end of file
@@ -0,0 +1,133 @@
+import heapq, logging, os, time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+import clusters, counters, models, pubsub
+from cache import entering_list_tags, report_tags, response_cache
+
+# Marks open reports "delayed" once their sla_deadline passes, and only once: the breach is stamped
+# in sla_breached_at, so a status staff set afterwards is left alone. The next deadlines live in an
+# in-memory heap seeded from ix_reports_sla_due, so a tick that finds nothing due costs no
+# query; due reports are moved in batches of SLA_BATCH, each one locked SELECT, one bulk UPDATE
+# and one batched status_history INSERT, so a backlog after an outage drains without per-row statements.
+SLA_CHECK_INTERVAL_SECONDS  = float(os.getenv("SLA_CHECK_INTERVAL_SECONDS", "30"))
+SLA_RESEED_INTERVAL_SECONDS = float(os.getenv("SLA_RESEED_INTERVAL_SECONDS", "300"))   # picks up other workers' reports
+SLA_HEAP_SIZE               = int(os.getenv("SLA_HEAP_SIZE", "10000"))
+SLA_BATCH                   = int(os.getenv("SLA_BATCH", "1000"))
+WATCHED_STATUSES = (
+    models.StatusEnum.submitted, models.StatusEnum.assigned,
+    models.StatusEnum.acknowledged, models.StatusEnum.in_progress,
+)
+REMARK = "SLA deadline passed"
+
+logger = logging.getLogger(__name__)
+
+def _due_filter(now: datetime) -> tuple:
+    return (models.Report.status.in_(WATCHED_STATUSES), models.Report.sla_breached_at.is_(None), models.Report.sla_deadline <= now)
+
+class SlaMonitor:
+    """Heap of (sla_deadline, report_id) for the earliest SLA_HEAP_SIZE watched reports.
+
+    Entries may go stale (resolved early, deadline moved): the UPDATE re-checks status, breach
+    and deadline, so a stale entry is simply skipped. Deadlines past `horizon` are not in the heap;
+    it is reseeded once the clock reaches the horizon and every SLA_RESEED_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, heap_size: int = SLA_HEAP_SIZE, batch: int = SLA_BATCH):
+        self.heap_size, self.batch = heap_size, batch
+        self.heap: List[Tuple[datetime, int]] = []
+        self.horizon: Optional[datetime] = None   # None: every watched deadline is in the heap
+        self.seeded_at = 0.0
+        self.delayed = 0
+
+    def seed(self, db: Session):
+        """Load the earliest deadlines: one index range scan per watched status, merged."""
+        per_status = [
+            db.query(models.Report.sla_deadline, models.Report.id)
+            .filter(models.Report.status == status, models.Report.sla_breached_at.is_(None), models.Report.sla_deadline.isnot(None))
+            .order_by(models.Report.sla_deadline).limit(self.heap_size).all()
+            for status in WATCHED_STATUSES
+        ]
+        entries = [(models.utc(deadline), rid) for rows in per_status for deadline, rid in rows]
+        entries.sort()
+        # a status that filled its limit may hold more deadlines just past its last row
+        full = [models.utc(rows[-1][0]) for rows in per_status if len(rows) == self.heap_size]
+        self.horizon = min(full) if full else None
+        self.heap = [e for e in entries if self.horizon is None or e[0] <= self.horizon][:self.heap_size]
+        if len(self.heap) == self.heap_size: self.horizon = self.heap[-1][0]
+        heapq.heapify(self.heap)
+        self.seeded_at = time.monotonic()
+
+    def _stale(self, now: datetime) -> bool:
+        return (not self.seeded_at or time.monotonic() - self.seeded_at >= SLA_RESEED_INTERVAL_SECONDS
+                or (self.horizon is not None and now >= self.horizon and (not self.heap or self.heap[0][0] > self.horizon)))
+
+    def _due(self, now: datetime) -> List[int]:
+        ids = []
+        while self.heap and self.heap[0][0] <= now and len(ids) < self.batch:
+            ids.append(heapq.heappop(self.heap)[1])
+        return ids
+
+    def tick(self, db: Session):
+        """Delay every watched report whose deadline has passed, one committed batch at a time."""
+        t0, moved = time.perf_counter(), 0
+        while True:
+            now = datetime.now(timezone.utc)
+            if self._stale(now): self.seed(db)
+            ids = self._due(now)
+            if not ids: break
+            moved += self._delay(db, ids, now)
+        if moved:
+            self.delayed += moved
+            logger.info("SLA monitor: %d reports marked delayed in %.2fs", moved, time.perf_counter() - t0)
+
+    def _delay(self, db: Session, ids: List[int], now: datetime) -> int:
+        try:
+            # lock the rows being moved; rows another writer holds come back with the next reseed
+            rows = db.query(
+                models.Report.id, models.Report.status, models.Report.issue_type, models.Report.latitude, models.Report.longitude,
+                models.Report.user_id, models.Report.department_id, models.Report.ward, models.Report.upvote_count, models.Report.priority,
+            ).filter(
+                models.Report.id.in_(ids), *_due_filter(now),
+            ).with_for_update(skip_locked=True).all()
+            if not rows:
+                db.rollback(); return 0
+            delayed = models.StatusEnum.delayed
+            # the UPDATE repeats the conditions, so where FOR UPDATE is a no-op (SQLite) two
+            # monitors still cannot both move a report; only what it returns is recorded
+            moved = set(db.execute(
+                update(models.Report)
+                .where(models.Report.id.in_([r.id for r in rows]), *_due_filter(now))
+                .values(status=delayed, sla_breached_at=now).returning(models.Report.id).execution_options(synchronize_session=False)
+            ).scalars())
+            rows = [r for r in rows if r.id in moved]
+            if not rows:
+                db.rollback(); return 0
+            db.execute(models.StatusHistory.__table__.insert(), [
+                {"report_id": r.id, "old_status": r.status, "new_status": delayed, "remark": REMARK, "changed_by": None} for r in rows
+            ])
+            clusters.record_status_changes(db, rows, delayed)
+            counters.record_status_changes(db, rows, delayed)
+            tags = report_tags(moved)
+            # lists of the old statuses shift on every page, not just the page holding the report
+            for issue_type, status in {(r.issue_type, r.status) for r in rows}:
+                tags |= entering_list_tags(issue_type, delayed) | entering_list_tags(issue_type, status)
+            response_cache.invalidate(db, tags)
+            for r in rows:
+                pubsub.hub.publish_on_commit(db, pubsub.report_delta(r.id, delayed, r.upvote_count or 0, r.priority, r.department_id, r.latitude, r.longitude))
+            db.commit()
+        except Exception:
+            db.rollback()
+            # put the batch back so the next tick retries it
+            for rid in ids: heapq.heappush(self.heap, (now, rid))
+            raise
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "heap_size": len(self.heap), "next_deadline": self.heap[0][0].isoformat() if self.heap else None,
+            "horizon": self.horizon.isoformat() if self.horizon else None, "delayed": self.delayed,
+        }
+
+monitor = SlaMonitor()
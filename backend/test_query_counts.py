@@ -0,0 +1,55 @@
+"""SELECTs per report-list request must not grow with the number of reports (no N+1).
+
+    python -m pytest -q test_query_counts.py
+
+Runs the app in-process against the throwaway SQLite database set up in conftest.py.
+"""
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+import database, main
+
+class SelectCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(database.engine, "before_cursor_execute", self._seen)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(database.engine, "before_cursor_execute", self._seen)
+
+    def _seen(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"): self.count += 1
+
+def _create_reports(client, headers, n):
+    dept_id = None
+    for i in range(n):
+        r = client.post("/api/reports/", headers=headers, json={
+            "title": f"pothole {i}", "description": "deep", "issue_type": "pothole",
+            # far enough apart that none is folded into another as a duplicate
+            "latitude": 10 + i * 0.01, "longitude": 10,
+        })
+        assert r.status_code == 201, r.text
+        dept_id = r.json()["department_id"]
+    return dept_id
+
+def _selects(client, headers, path):
+    with SelectCounter() as counter:
+        r = client.get(path, headers=headers)
+    assert r.status_code == 200, r.text
+    return counter.count, len(r.json())
+
+def test_report_lists_use_a_constant_number_of_selects():
+    with TestClient(main.app) as client:
+        r = client.post("/api/auth/signup", json={"name": "q", "email": "queries@example.com", "password": "pw"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        dept_id = _create_reports(client, headers, 2)
+        paths = ["/api/reports/?limit=100", "/api/reports/my", f"/api/departments/{dept_id}/reports"]
+        for path in paths: _selects(client, headers, path)   # warm the per-process caches
+        few = {path: _selects(client, headers, path) for path in paths}
+        _create_reports(client, headers, 20)
+        many = {path: _selects(client, headers, path) for path in paths}
+    for path in paths:
+        assert many[path][1] == few[path][1] + 20, path
+        assert many[path][0] == few[path][0], f"{path}: {few[path][0]} SELECTs for {few[path][1]} reports, {many[path][0]} for {many[path][1]}"
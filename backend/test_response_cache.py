@@ -0,0 +1,36 @@
+"""Cached report lists must not outlive a status change that shifts their pages.
+
+    python -m pytest -q test_response_cache.py
+"""
+from fastapi.testclient import TestClient
+import database, main, models
+from cache import response_cache
+
+def _ids(client, path):
+    r = client.get(path)
+    assert r.status_code == 200, r.text
+    return [report["id"] for report in r.json()]
+
+def test_status_change_refreshes_later_pages_of_the_old_status(monkeypatch):
+    monkeypatch.setattr(response_cache, "enabled", True)
+    with TestClient(main.app) as client:
+        r = client.post("/api/auth/signup", json={"name": "s", "email": "staff@example.com", "password": "pw"})
+        user_id, headers = r.json()["user"]["id"], {"Authorization": f"Bearer {r.json()['access_token']}"}
+        ids = []
+        for i in range(4):
+            r = client.post("/api/reports/", headers=headers, json={
+                "title": f"light {i}", "description": "out", "issue_type": "streetlight", "latitude": 20 + i * 0.01, "longitude": 20,
+            })
+            assert r.status_code == 201, r.text
+            ids.append(r.json()["id"])
+        status = r.json()["status"]
+        db = database.SessionLocal()
+        db.query(models.User).filter(models.User.id == user_id).update({"role": models.RoleEnum.department}); db.commit(); db.close()
+
+        page = f"/api/reports/?issue_type=streetlight&status={status}&limit=2&skip=2"
+        assert _ids(client, page) == [ids[1], ids[0]]
+        assert _ids(client, page) == [ids[1], ids[0]]   # now served from the cache
+        # the newest report leaves the filter; it was never on this page, yet the page shifts
+        r = client.patch(f"/api/reports/{ids[3]}/status", headers=headers, json={"status": "resolved"})
+        assert r.status_code == 200, r.text
+        assert _ids(client, page) == [ids[0]]
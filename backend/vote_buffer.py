@@ -0,0 +1,123 @@
+import logging, os, threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from sqlalchemy import bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+import models, pubsub, services
+from cache import report_tags, response_cache
+
+# Write-behind vote counting for viral reports: vote rows are committed immediately, but
+# upvote_count/priority deltas are summed per report in memory and applied in one batched
+# UPDATE every VOTE_FLUSH_INTERVAL_MS, so voters never queue on the report row lock.
+VOTE_WRITE_BEHIND               = os.getenv("VOTE_WRITE_BEHIND", "0") == "1"
+VOTE_FLUSH_INTERVAL_MS          = float(os.getenv("VOTE_FLUSH_INTERVAL_MS", "250"))
+VOTE_RECONCILE_INTERVAL_SECONDS = float(os.getenv("VOTE_RECONCILE_INTERVAL_SECONDS", "600"))
+
+logger = logging.getLogger(__name__)
+
+class VoteBuffer:
+    def __init__(self):
+        self._deltas: Dict[int, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, report_id: int, delta: int):
+        with self._lock:
+            self._deltas[report_id] += delta
+
+    def _drain(self) -> Dict[int, int]:
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+        return {rid: d for rid, d in deltas.items() if d}
+
+    def flush(self, db: Session):
+        deltas = self._drain()
+        if not deltas: return
+        ids = sorted(deltas)   # fixed lock order across concurrent flushers
+        try:
+            table = models.Report.__table__
+            db.execute(
+                update(table).where(table.c.id == bindparam("rid"))
+                .values(upvote_count=table.c.upvote_count + bindparam("delta")),
+                [{"rid": rid, "delta": deltas[rid]} for rid in ids],
+            )
+            _reprioritize(db, ids)
+            response_cache.invalidate(db, report_tags(ids))
+            db.commit()
+        except Exception:
+            db.rollback()
+            # keep the deltas for the next flush instead of dropping votes
+            for rid, d in deltas.items(): self.add(rid, d)
+            raise
+        logger.debug("Flushed vote deltas for %d reports", len(ids))
+
+def _reprioritize(db: Session, ids):
+    rows = db.query(
+        models.Report.id, models.Report.upvote_count, models.Report.created_at, models.Report.status,
+        models.Report.department_id, models.Report.latitude, models.Report.longitude,
+    ).filter(models.Report.id.in_(ids)).all()
+    if not rows: return
+    scores = {r.id: services.compute_priority_score(r.upvote_count or 0, r.created_at) for r in rows}
+    db.execute(update(models.Report), [
+        {"id": rid, "priority_score": score, "priority": services.score_to_label(score)} for rid, score in scores.items()
+    ])
+    for r in rows:
+        pubsub.hub.publish_on_commit(db, pubsub.report_delta(
+            r.id, r.status, r.upvote_count or 0, services.score_to_label(scores[r.id]), r.department_id, r.latitude, r.longitude,
+        ))
+
+class Reconciler:
+    """Repairs drift between reports.upvote_count and COUNT(votes) over two passes.
+
+    upvote_count - COUNT(votes) also counts deltas still waiting in some worker's buffer, so a
+    measured drift is only acted on at the next pass, and only for reports whose row nothing has
+    written since (updated_at older than the measurement, upvote_count unchanged): any pending
+    delta would have been flushed into the row in between. The repair subtracts the measured drift
+    instead of writing COUNT(votes), so deltas flushed after the check are kept.
+    """
+
+    def __init__(self):
+        self.suspects: Dict[int, Tuple[int, int]] = {}   # report id -> (upvote_count, drift) when measured
+        self.measured_at: Optional[datetime] = None
+
+    def run(self, db: Session):
+        if VOTE_WRITE_BEHIND: buffer.flush(db)
+        if self.suspects: self._repair(db)
+        self._measure(db)
+
+    def _measure(self, db: Session):
+        # the database clock, as updated_at is written by it; taken before the counts are read
+        measured_at = db.query(func.now()).scalar()
+        # one pass over ix_votes_report_id, joined to reports, instead of a COUNT per report
+        votes = select(models.Vote.report_id, func.count().label("n")).group_by(models.Vote.report_id).subquery()
+        count = func.coalesce(models.Report.upvote_count, 0)
+        drift = count - func.coalesce(votes.c.n, 0)
+        rows = db.query(models.Report.id, count.label("upvote_count"), drift.label("drift")).outerjoin(
+            votes, votes.c.report_id == models.Report.id).filter(drift != 0).all()
+        db.rollback()
+        self.suspects = {r.id: (r.upvote_count, r.drift) for r in rows}
+        self.measured_at = measured_at
+
+    def _repair(self, db: Session):
+        table = models.Report.__table__
+        # one second of margin: SQLite stores CURRENT_TIMESTAMP without fractions
+        cutoff = self.measured_at - timedelta(seconds=1)
+        repaired = []
+        for rid, (seen, drift) in sorted(self.suspects.items()):
+            res = db.execute(
+                update(table).where(
+                    table.c.id == rid, func.coalesce(table.c.upvote_count, 0) == seen,
+                    or_(table.c.updated_at.is_(None), table.c.updated_at < cutoff),
+                ).values(upvote_count=func.coalesce(table.c.upvote_count, 0) - drift)
+            )
+            if res.rowcount: repaired.append(rid)
+        self.suspects = {}
+        if not repaired:
+            db.rollback(); return
+        _reprioritize(db, repaired)
+        response_cache.invalidate(db, report_tags(repaired))
+        db.commit()
+        logger.warning("Vote reconciliation repaired upvote_count on %d reports", len(repaired))
+
+buffer = VoteBuffer()
+reconciler = Reconciler()
@@ -8,8 +8,10 @@ import { Plus, AlertCircle } from 'lucide-react'
 export default function DashboardPage() {
   const { user } = useAuth()
   const [reports, setReports] = useState([]); const [loading, setLoading] = useState(true)
+  const [counts, setCounts] = useState(null)
   useEffect(() => { api.get('/reports/my').then(r => setReports(r.data)).catch(console.error).finally(() => setLoading(false)) }, [])
-  const stats = { total:reports.length, resolved:reports.filter(r=>r.status==='resolved').length, pending:reports.filter(r=>!['resolved','rejected'].includes(r.status)).length, delayed:reports.filter(r=>r.status==='delayed').length }
+  useEffect(() => { api.get('/stats/me').then(r => setCounts(r.data)).catch(console.error) }, [])
+  const stats = { total:counts?.total ?? 0, resolved:counts?.by_status.resolved ?? 0, pending:counts?.pending ?? 0, delayed:counts?.by_status.delayed ?? 0 }
   return (
     <div className="max-w-5xl mx-auto px-4 py-8">
       <div className="flex justify-between items-center mb-8">
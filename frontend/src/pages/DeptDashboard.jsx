@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import api from '../utils/api'
+import { subscribeLive } from '../utils/live'
 import StatusBadge from '../components/StatusBadge'
 import { timeAgo, issueIcon, isSlaBreached } from '../utils/helpers'
 import { AlertCircle } from 'lucide-react'
@@ -10,7 +11,17 @@ export default function DeptDashboard() {
   const [depts, setDepts] = useState([]); const [deptId, setDeptId] = useState(null)
   const [reports, setReports] = useState([]); const [loading, setLoading] = useState(true); const [updating, setUpdating] = useState(null)
   useEffect(() => { api.get('/departments/').then(r => { setDepts(r.data); if (r.data.length) setDeptId(r.data[0].id) }) }, [])
-  useEffect(() => { if (!deptId) return; setLoading(true); api.get(`/departments/${deptId}/reports`).then(r => setReports(r.data)).finally(() => setLoading(false)) }, [deptId])
+  const [counts, setCounts] = useState(null)
+  const loadReports = () => {
+    api.get(`/stats/departments/${deptId}`).then(r => setCounts(r.data)).catch(console.error)
+    return api.get(`/departments/${deptId}/reports`).then(r => setReports(r.data)).finally(() => setLoading(false))
+  }
+  useEffect(() => { if (!deptId) return; setLoading(true); loadReports() }, [deptId])
+  // new reports arrive without their full body, so those (and resyncs) refetch the list
+  useEffect(() => { if (!deptId) return; return subscribeLive({ departments: deptId }, m => {
+    if (m.type === 'report') setReports(rs => rs.map(r => r.id===m.id ? {...r, status:m.status, upvote_count:m.upvote_count, priority:m.priority} : r))
+    else loadReports()
+  }) }, [deptId])
   const updateStatus = async (reportId, status) => {
     setUpdating(reportId)
     try { await api.patch(`/reports/${reportId}/status`, { status, remark:`Status updated to ${status}` }); toast.success('Updated'); setReports(rs => rs.map(r => r.id===reportId ? {...r,status} : r)) }
@@ -20,7 +31,7 @@ export default function DeptDashboard() {
   return (
     <div className="max-w-6xl mx-auto px-4 py-8">
       <div className="flex justify-between items-center mb-8">
-        <div><h1 className="text-2xl font-bold">Department Dashboard</h1><p className="text-gray-500 text-sm mt-1">Manage assigned issues</p></div>
+        <div><h1 className="text-2xl font-bold">Department Dashboard</h1><p className="text-gray-500 text-sm mt-1">Manage assigned issues{counts && ` · ${counts.pending} open of ${counts.total} · ${counts.by_status.delayed ?? 0} delayed`}</p></div>
         <select className="input w-auto" value={deptId||''} onChange={e => setDeptId(Number(e.target.value))}>{depts.map(d => <option key={d.id} value={d.id}>{d.name}</option>)}</select>
       </div>
       {loading ? <div className="flex justify-center py-20"><div className="animate-spin rounded-full h-8 w-8 border-b-2 border-blue-600"></div></div> : (
@@ -2,6 +2,7 @@ import { useState, useEffect } from 'react'
 import { useParams, Link } from 'react-router-dom'
 import { MapContainer, TileLayer, Marker } from 'react-leaflet'
 import api from '../utils/api'
+import { subscribeLive } from '../utils/live'
 import { useAuth } from '../context/AuthContext'
 import StatusBadge from '../components/StatusBadge'
 import { timeAgo, issueIcon, isSlaBreached, priorityColor } from '../utils/helpers'
@@ -13,10 +14,19 @@ export default function IssueDetailPage() {
   const [report, setReport] = useState(null); const [loading, setLoading] = useState(true); const [voting, setVoting] = useState(false)
   const load = () => api.get(`/reports/${id}`).then(r => setReport(r.data)).finally(() => setLoading(false))
   useEffect(() => { load() }, [id])
+  // counts and priority patch in place; a status change also needs the new history entry
+  useEffect(() => subscribeLive({ reports: id }, m => {
+    if (m.type === 'resync') { load(); return }
+    setReport(r => {
+      if (!r || m.id !== r.id) return r
+      if (m.status !== r.status) load()
+      return { ...r, upvote_count: m.upvote_count, priority: m.priority }
+    })
+  }), [id])
   const vote = async () => {
     if (!user) { toast.error('Login to upvote'); return }
     setVoting(true)
-    try { await api.post(`/votes/${id}`); toast.success('Verified!'); load() }
+    try { await api.post(`/votes/${id}`); toast.success('Verified!'); setReport(r => ({ ...r, voted_by_me: true })) }
     catch (err) { toast.error(err.response?.data?.detail || 'Could not vote') }
     finally { setVoting(false) }
   }
@@ -34,7 +44,7 @@ export default function IssueDetailPage() {
               {breached && report.status !== 'resolved' && <span className="inline-flex items-center gap-1 bg-red-50 text-red-600 text-xs px-2 py-0.5 rounded-full"><AlertCircle className="w-3 h-3" />SLA Breached</span>}
             </div>
           </div>
-          <button onClick={vote} disabled={voting} className="btn-secondary flex items-center gap-2 text-sm"><ThumbsUp className="w-4 h-4 text-blue-500" />Verify ({report.upvote_count})</button>
+          <button onClick={vote} disabled={voting || report.voted_by_me} className="btn-secondary flex items-center gap-2 text-sm"><ThumbsUp className="w-4 h-4 text-blue-500" />Verify ({report.upvote_count})</button>
         </div>
         <p className="text-gray-600 mb-4">{report.description}</p>
         <div className="grid grid-cols-2 gap-3 text-sm text-gray-500 mb-4">
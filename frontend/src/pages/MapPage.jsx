@@ -1,16 +1,38 @@
 import { useState, useEffect } from 'react'
-import { MapContainer, TileLayer, CircleMarker, Popup } from 'react-leaflet'
+import { MapContainer, TileLayer, CircleMarker, Popup, useMapEvents } from 'react-leaflet'
 import { Link } from 'react-router-dom'
 import api from '../utils/api'
+import { subscribeLive } from '../utils/live'
 import { STATUS_COLORS, ISSUE_TYPES, timeAgo } from '../utils/helpers'
 import StatusBadge from '../components/StatusBadge'
 import { Filter } from 'lucide-react'
+const toBbox = b => [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()].map(n => n.toFixed(5)).join(',')
+function ViewportWatcher({ onChange }) {
+  const map = useMapEvents({ moveend() { onChange(toBbox(map.getBounds())) } })
+  useEffect(() => { onChange(toBbox(map.getBounds())) }, [])
+  return null
+}
 export default function MapPage() {
-  const [reports, setReports] = useState([]); const [filters, setFilters] = useState({ issue_type:'', status:'' })
+  const [reports, setReports] = useState([]); const [filters, setFilters] = useState({ issue_type:'', status:'' }); const [bbox, setBbox] = useState(null); const [refresh, setRefresh] = useState(0)
   useEffect(() => {
-    const p = {}; if (filters.issue_type) p.issue_type = filters.issue_type; if (filters.status) p.status = filters.status
+    if (!bbox) return
+    const p = { bbox, limit: 200 }; if (filters.issue_type) p.issue_type = filters.issue_type; if (filters.status) p.status = filters.status
     api.get('/reports/', { params: p }).then(r => setReports(r.data)).catch(console.error)
-  }, [filters])
+  }, [filters, bbox, refresh])
+  // markers follow live deltas for the viewport; filters are applied here since the feed is by area only
+  useEffect(() => {
+    if (!bbox) return
+    const matches = m => (!filters.issue_type || !m.issue_type || m.issue_type === filters.issue_type) && (!filters.status || m.status === filters.status)
+    return subscribeLive({ bbox }, m => {
+      if (m.type === 'resync') { setRefresh(n => n + 1); return }
+      setReports(rs => {
+        const known = rs.some(r => r.id === m.id)
+        if (m.type === 'created') return known || !matches(m) ? rs : [m, ...rs]
+        if (!known) return rs
+        return matches(m) ? rs.map(r => r.id === m.id ? { ...r, status:m.status, upvote_count:m.upvote_count, priority:m.priority } : r) : rs.filter(r => r.id !== m.id)
+      })
+    })
+  }, [filters, bbox])
   return (
     <div className="flex flex-col h-[calc(100vh-64px)]">
       <div className="bg-white border-b px-4 py-3 flex flex-wrap gap-3 items-center">
@@ -27,12 +49,13 @@ export default function MapPage() {
       <div className="flex-1">
         <MapContainer center={[12.9716, 77.5946]} zoom={13} style={{ height:'100%', width:'100%' }}>
           <TileLayer url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png" attribution="&copy; OpenStreetMap contributors" />
+          <ViewportWatcher onChange={setBbox} />
           {reports.map(r => (
             <CircleMarker key={r.id} center={[r.latitude, r.longitude]} radius={10} fillColor={STATUS_COLORS[r.status]||'#6B7280'} color="white" weight={2} fillOpacity={0.8}>
               <Popup>
                 <div className="min-w-[180px]">
                   <div className="font-semibold mb-1">{r.title}</div><StatusBadge status={r.status} />
-                  <p className="text-xs text-gray-500 mt-2">{r.description.slice(0,80)}...</p>
+                  <p className="text-xs text-gray-500 mt-2">{r.description ? `${r.description.slice(0,80)}...` : ''}</p>
                   <div className="text-xs text-gray-400 mt-1 mb-2">👍 {r.upvote_count} · {timeAgo(r.created_at)}</div>
                   <Link to={`/report/${r.id}`} className="text-xs text-blue-600 hover:underline">View details →</Link>
                 </div>
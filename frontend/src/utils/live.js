@@ -0,0 +1,16 @@
+// Live report deltas from /api/live. params: { reports, departments, bbox } (comma-separated strings).
+// onMessage gets { type: 'report' | 'created' | 'resync', ... }; after a reconnect it gets a resync,
+// since deltas sent while the socket was down are lost. Returns a function that closes it for good.
+export function subscribeLive(params, onMessage) {
+  const query = new URLSearchParams(Object.entries(params).filter(([, v]) => v)).toString()
+  const url = `${location.protocol === 'https:' ? 'wss' : 'ws'}://${location.host}/api/live?${query}`
+  let ws, timer, retries = 0, closed = false
+  const connect = () => {
+    ws = new WebSocket(url)
+    ws.onopen = () => { if (retries) onMessage({ type: 'resync' }); retries = 0 }
+    ws.onmessage = e => onMessage(JSON.parse(e.data))
+    ws.onclose = () => { if (!closed) timer = setTimeout(connect, Math.min(1000 * 2 ** retries++, 30000)) }
+  }
+  connect()
+  return () => { closed = true; clearTimeout(timer); ws.close() }
+}
@@ -4,6 +4,6 @@ export default defineConfig({
   plugins: [react()],
   server: {
     port: 5173,
-    proxy: { '/api': { target: 'http://localhost:8000', changeOrigin: true } }
+    proxy: { '/api': { target: 'http://localhost:8000', changeOrigin: true, ws: true } }
   }
 })
\ No newline at end of file